@@ -1,14 +1,21 @@
-import maya.cmds as cmds
+import numpy as np
 import string
 import math
 
-def allign(vtx1, vtx2, local_y_flip=False):
+try:
+    import maya.cmds as cmds
+except ImportError:
+    # Only the array helpers work outside of maya, like the ones in utils
+    cmds = None
+
+def allign(vtx1, vtx2, local_y_flip=False, rotation=None):
     """Alligns the normal of vtx1 to the normal of vtx2
 
     Args:
         vtx1 (str): name of the source vertex
         vtx2 (str): name of the destination vertex
         local_y_flip (bool): whether to flip source object along it's Y axis once alligned
+        rotation (float[]): precomputed euler [x, y, z] degrees from get_alignments, skips the normal queries
 
     Returns:
         None
@@ -16,11 +23,13 @@ def allign(vtx1, vtx2, local_y_flip=False):
 
     # Matching rotation of face normal
     obj_name = vtx1.split(".")[0]
-    vec1 = cmds.polyNormalPerVertex(vtx1, query=True, xyz=True)[:3]
-    vec2 = cmds.polyNormalPerVertex(vtx2, query=True, xyz=True)[:3]
-    rotation_matrix = get_rotation_matrix(vec1, vec2)
-    euler_radians = rotation_matrix_to_euler(rotation_matrix)    
-    r_x, r_y, r_z = [math.degrees(i) for i in euler_radians]
+    if rotation is None:
+        vec1 = cmds.polyNormalPerVertex(vtx1, query=True, xyz=True)[:3]
+        vec2 = cmds.polyNormalPerVertex(vtx2, query=True, xyz=True)[:3]
+        rotation_matrix = get_rotation_matrix(vec1, vec2)
+        euler_radians = rotation_matrix_to_euler(rotation_matrix)    
+        rotation = [math.degrees(i) for i in euler_radians]
+    r_x, r_y, r_z = rotation
     cmds.rotate(r_x, r_y, r_z, [obj_name])
     
     if local_y_flip:
@@ -33,7 +42,7 @@ def allign(vtx1, vtx2, local_y_flip=False):
     cmds.move(v2_x, v2_y, v2_z, [obj_name], rpr=True, ws=True)
 
 
-def allign_and_cache_weld_positions(vtx1, vtx2, reference_area=None, local_y_flip=False):
+def allign_and_cache_weld_positions(vtx1, vtx2, reference_area=None, local_y_flip=False, rotation=None):
     """Alligns the normal of vtx1 to the normal of vtx2 and stores information needed to weld the two objects
 
     Args:
@@ -41,6 +50,7 @@ def allign_and_cache_weld_positions(vtx1, vtx2, reference_area=None, local_y_fli
         vtx2 (str): name of the destination vertex
         reference_area (float): reference face area from the source object for relative resizing
         local_y_flip (bool): whether to flip source object along it's Y axis once alligned
+        rotation (float[]): precomputed euler [x, y, z] degrees from get_alignments
 
     Returns:
         obj1 (str): name of the source object
@@ -60,7 +70,7 @@ def allign_and_cache_weld_positions(vtx1, vtx2, reference_area=None, local_y_fli
     border_verts1.remove(vtx1)
     border_verts2.remove(vtx2)
 
-    allign(vtx1, vtx2, local_y_flip)
+    allign(vtx1, vtx2, local_y_flip, rotation)
 
     # Getting the object names of the source and destination vertices
     obj1 = vtx1.split(".")[0]
@@ -85,7 +95,7 @@ def allign_and_cache_weld_positions(vtx1, vtx2, reference_area=None, local_y_fli
     return obj1, obj2, bv_cache1, bv_cache2, faces_to_delete
 
 
-def weld_all(obj_name, source_positions_2D, dest_positions_2D, maintain_source_shape=False):
+def weld_all(obj_name, source_positions_2D, dest_positions_2D, maintain_source_shape=False, tolerance=0.001):
     """Welds all the source verticies to the destination verticies by bridging or merging
 
     Args:
@@ -93,6 +103,7 @@ def weld_all(obj_name, source_positions_2D, dest_positions_2D, maintain_source_s
         source_positions_2D (float[][]): positions of source vertecies
         dest_positions_2D (float[][]): positions of destination vertecies
         maintain_source_shape (bool): maintain the shape of the source object by leaving a bridge between the two borders
+        tolerance (float): maximum distance between a vertex and a stored position for them to match
 
     Returns:
         None
@@ -100,31 +111,30 @@ def weld_all(obj_name, source_positions_2D, dest_positions_2D, maintain_source_s
 
     cmds.select(cl=True)
 
-    num_verts = cmds.polyEvaluate(obj_name, v=True)
-
-    # Script encounters float comparison errors if I don't round all of the positions
-    source_positions_2D = [[[round(i, 2) for i in pos] for pos in sp] for sp in source_positions_2D]
-    dest_positions_2D = [[[round(i, 2) for i in pos] for pos in dp] for dp in dest_positions_2D]
-
-    # Looping through all the vertices of the object to find the verts that match the stored positions
-    source_verts = []
-    dest_verts = []
-    for i in range(num_verts):
-        vert = "{}.vtx[{}]".format(obj_name, i)
-        pos = get_position(vert)
-        pos = [round(i, 2) for i in pos]
-
-        idx = 0
-        for sp, dp in zip(source_positions_2D, dest_positions_2D):
-            if pos in sp:
-                source_verts.append((idx, vert))
-            elif pos in dp:
-                dest_verts.append((idx, vert))
-            idx += 1
+    snapshot = MeshSnapshot(obj_name)
+    num_verts = snapshot.num_verts
+
+    # Tagging every cached position with the copy it belongs to and which side of the weld it's on
+    cached_positions = []
+    copy_ids = []
+    is_source = []
+    for idx, (sp, dp) in enumerate(zip(source_positions_2D, dest_positions_2D)):
+        cached_positions += list(sp) + list(dp)
+        copy_ids += [idx] * (len(sp) + len(dp))
+        is_source += [True] * len(sp) + [False] * len(dp)
+
+    # Matching all the vertices of the object to the stored positions in one pass
+    vert_ids, cached_ids = match_points(snapshot.points, cached_positions, tolerance)
+    copy_ids = np.array(copy_ids, dtype=np.int64)[cached_ids]
+    is_source = np.array(is_source, dtype=bool)[cached_ids]
+
+    # Keys sort by copy first and vertex id second, a vertex matching both sides of a copy counts as source
+    source_keys = np.unique(copy_ids[is_source] * num_verts + vert_ids[is_source])
+    dest_keys = np.setdiff1d(copy_ids[~is_source] * num_verts + vert_ids[~is_source], source_keys)
+    source_verts = ["{}.vtx[{}]".format(obj_name, i % num_verts) for i in source_keys]
+    dest_verts = ["{}.vtx[{}]".format(obj_name, i % num_verts) for i in dest_keys]
 
     # Splitting the vertices into chunks based on the vert count of the border edges
-    source_verts = [j for i, j in sorted(source_verts, key=lambda x: x[0])]
-    dest_verts = [j for i, j in sorted(dest_verts, key=lambda x: x[0])]
     chunk_length = len(dest_positions_2D[0])
     sv_split = [source_verts[i:i + chunk_length] for i in range(0, len(source_verts), chunk_length)]
     dv_split = [dest_verts[i:i + chunk_length] for i in range(0, len(dest_verts), chunk_length)]
@@ -148,32 +158,238 @@ def weld_all(obj_name, source_positions_2D, dest_positions_2D, maintain_source_s
             cmds.select(edge_loop, add=True)
         cmds.polyDelEdge(cv=True)
 
-def allign_and_weld_multiple(source_vert, dest_verts, reference_face_area, local_y_flip=False, maintain_source_shape=False):
+def get_vertex_normals(obj_name, snapshot, vert_ids):
+    """Returns the normal polyNormalPerVertex reports first for each vertex, as an Nx3 array"""
+    normals = get_face_vertex_normals(obj_name)
+    vert_ids = np.asarray(vert_ids, dtype=np.int64)
+    # First face corner of every vertex, -1 for vertices no face uses
+    first_corners = np.full(snapshot.num_verts, -1, dtype=np.int64)
+    used, corners = np.unique(snapshot.face_vertices, return_index=True)
+    first_corners[used] = corners
+    faceless = vert_ids[first_corners[vert_ids] == -1]
+    if len(faceless):
+        raise Exception("{}.vtx[{}] is not part of any face, it has no normal".format(obj_name, faceless[0]))
+    return normals[first_corners[vert_ids]]
+
+
+def select_faces(face_offsets, face_ids, reverse=False):
+    """Returns the face offsets and flat corner indices of a subset of faces
+
+    With reverse the winding of every face is flipped, which keeps the normals of a mirrored copy pointing out
+    """
+    face_ids = np.asarray(face_ids, dtype=np.int64)
+    sizes = face_offsets[face_ids + 1] - face_offsets[face_ids]
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    local = np.arange(offsets[-1]) - np.repeat(offsets[:-1], sizes)
+    if reverse:
+        local = np.repeat(sizes - 1, sizes) - local
+    return offsets, np.repeat(face_offsets[face_ids], sizes) + local
+
+
+def index_border_loops(topology):
+    """Returns every border loop of a topology and a dict from each border vertex to the index of it's loop"""
+    loops = topology.border_loops()
+    return loops, dict((vert, i) for i, loop in enumerate(loops) for vert in loop)
+
+
+def pair_holes(copy_hole_points, dest_hole_points):
+    """Pairs up the vertices of every copy's hole with the vertices of it's destination hole
+
+    A mirrored copy's hole winds the opposite way to the destination's, an unmirrored one winds the same way, so
+    both orders are tried with every shift and the one that puts every pair closest together is kept
+
+    Args:
+        copy_hole_points (float[][][]): CxNx3 positions of the hole around the source vertex on every copy
+        dest_hole_points (float[][][]): CxNx3 positions of the hole around every destination vertex
+
+    Returns:
+        np.ndarray: CxN index into each destination hole for every vertex of the copy's hole
+    """
+    hole_size = copy_hole_points.shape[1]
+    i = np.arange(hole_size)
+    orders = np.concatenate([(i[:, None] - i[None]) % hole_size, (i[:, None] + i[None]) % hole_size])
+    dist = np.stack([np.sum((copy_hole_points - dest_hole_points[:, order]) ** 2, axis=(1, 2)) for order in orders], axis=1)
+    return orders[dist.argmin(axis=1)]
+
+
+def find_hole(border_loops, loop_index, border_verts, vert_name):
+    """Returns the border loop left by deleting the faces around a vertex, in winding order
+
+    border_loops and loop_index come from index_border_loops, so every lookup only costs the size of the hole
+    """
+    border_verts = border_verts.tolist()
+    loop_id = loop_index.get(border_verts[0]) if border_verts else None
+    if loop_id is None or set(border_loops[loop_id]) != set(border_verts):
+        raise Exception("Faces around {} overlap another destination or a border".format(vert_name))
+    return np.array(border_loops[loop_id], dtype=np.int64)
+
+
+def allign_and_weld_bulk(source_vert, dest_verts, reference_face_area, local_y_flip=False, maintain_source_shape=False, tolerance=0.001):
+    """Same result as allign_and_weld_multiple, but every copy is placed and welded without touching the scene
+
+    The normals, positions and face areas of all the destinations are read in one pass per object and every
+    transform is computed up front. The holes left around the source and destination vertices are then paired
+    up and either bridged or merged by remapping vertex ids, and the welded result is created as a single mesh
+    which replaces the destination objects. The source object is expected to have it's transforms frozen, like
+    allign_and_weld_multiple expects.
+
+    Args:
+        source_vert (str): source vertex to allign and weld along destination verts
+        dest_verts (str[]): vertices to be used as destinations, packed names or ComponentSelections
+        reference_face_area (float): reference face area for relative resizing
+        local_y_flip (bool): whether to flip source object along it's Y axis once alligned
+        maintain_source_shape (bool): maintain the shape of the source object by leaving a bridge between the two borders
+        tolerance (float): vertices closer than this are merged together
+
+    Returns:
+        str: name of the welded object
+    """
+
+    obj_name = source_vert.split(".")[0]
+    vert_id = int(ComponentSelection.from_name(source_vert).ids[0])
+    source = MeshSnapshot(obj_name)
+    (source_faces,), (source_border,) = source.topology.vertex_neighbourhoods([vert_id])
+    source_normal = get_vertex_normals(obj_name, source, [vert_id])[0]
+
+    # Copies keep every source face except the ones around the source vertex, mirrored copies are rewound
+    source_uvs, source_corner_uvs = get_corner_uvs(obj_name, source.face_offsets)
+    source_groups = get_face_shading_groups(obj_name, source.num_faces)
+    source_kept = np.setdiff1d(np.arange(source.num_faces), source_faces)
+    copy_offsets, copy_corners = select_faces(source.face_offsets, source_kept, reverse=local_y_flip)
+    copy_faces = source.face_vertices[copy_corners]
+    source_loops = index_border_loops(MeshTopology(source.num_verts, copy_offsets, copy_faces))
+    source_hole = find_hole(source_loops[0], source_loops[1], source_border, source_vert)
+
+    # Reading every destination, grouped by the object it's on
+    dest_selections = ComponentSelection.from_names(dest_verts)
+    for selection in dest_selections:
+        if selection.kind != "vtx":
+            raise Exception("{} are not vertices".format(selection))
+    dest_objs = [i.obj_name for i in dest_selections]
+
+    positions, normals, areas, dest_holes = [], [], [], []
+    points, counts, face_vertices, corner_uvs, uvs, shading_groups = [], [], [], [], [], []
+    num_points = num_uvs = 0
+    for dest_obj, ids in zip(dest_objs, [i.ids for i in dest_selections]):
+        snapshot = MeshSnapshot(dest_obj)
+        faces_per_vert, border_per_vert = snapshot.topology.vertex_neighbourhoods(ids)
+        positions.append(snapshot.points[ids])
+        normals.append(get_vertex_normals(dest_obj, snapshot, ids))
+        areas.append(snapshot.face_areas[[i[0] for i in faces_per_vert]])
+
+        kept = np.setdiff1d(np.arange(snapshot.num_faces), np.concatenate(faces_per_vert))
+        offsets, corners = select_faces(snapshot.face_offsets, kept)
+        # Every hole on the object is found from one pass over it's borders
+        border_loops, loop_index = index_border_loops(MeshTopology(snapshot.num_verts, offsets, snapshot.face_vertices[corners]))
+        for vert, border in zip(ids, border_per_vert):
+            hole = find_hole(border_loops, loop_index, border, "{}.vtx[{}]".format(dest_obj, vert))
+            dest_holes.append(hole + num_points)
+
+        obj_uvs, obj_corner_uvs = get_corner_uvs(dest_obj, snapshot.face_offsets)
+        obj_corner_uvs = obj_corner_uvs[corners]
+        points.append(snapshot.points)
+        counts.append(np.diff(offsets))
+        face_vertices.append(snapshot.face_vertices[corners] + num_points)
+        corner_uvs.append(np.where(obj_corner_uvs >= 0, obj_corner_uvs + num_uvs, -1))
+        uvs.append(obj_uvs)
+        shading_groups.append(get_face_shading_groups(dest_obj, snapshot.num_faces)[kept])
+        num_points += len(snapshot.points)
+        num_uvs += len(obj_uvs)
+    positions, normals, areas = [np.concatenate(i) for i in (positions, normals, areas)]
+    dest_points = np.concatenate(points)
+
+    if any(len(i) != len(source_hole) for i in dest_holes):
+        raise Exception("Every destination needs as many border vertices as the source vertex has ({})".format(len(source_hole)))
+    dest_holes = np.array(dest_holes, dtype=np.int64).reshape(-1, len(source_hole))
+
+    # Rotating, flipping and resizing around the source vertex, then moving it onto the destination
+    matrices, _, _ = get_alignments(source_normal, normals)
+    if local_y_flip:
+        matrices = matrices * np.array([1, -1, 1])
+    scales = np.sqrt(areas / reference_face_area) if reference_face_area else np.ones(len(areas))
+    offsets = source.points - source.points[vert_id]
+    copy_points = np.einsum("kij,vj->kvi", matrices, offsets) * scales[:, None, None] + positions[:, None]
+
+    num_copies, hole_size = dest_holes.shape
+    order = pair_holes(copy_points[:, source_hole], dest_points[dest_holes])
+    paired = dest_holes[np.arange(num_copies)[:, None], order]
+
+    # Tiling the kept source faces once for every copy
+    copy_bases = num_points + np.arange(num_copies)[:, None] * source.num_verts
+    uv_bases = num_uvs + np.arange(num_copies)[:, None] * len(source_uvs)
+    copy_corner_uvs = np.broadcast_to(source_corner_uvs[copy_corners], (num_copies, len(copy_corners)))
+    counts.append(np.tile(np.diff(copy_offsets), num_copies))
+    face_vertices.append((copy_faces[None] + copy_bases).ravel())
+    corner_uvs.append(np.where(copy_corner_uvs >= 0, copy_corner_uvs + uv_bases, -1).ravel())
+    uvs.append(np.tile(source_uvs, (num_copies, 1)))
+    shading_groups.append(np.tile(source_groups[source_kept], num_copies))
+
+    if maintain_source_shape:
+        # Bridging each source hole to it's destination hole with a ring of quads
+        source_ids = source_hole[None] + copy_bases
+        bridges = np.stack([np.roll(source_ids, -1, axis=1), source_ids, paired, np.roll(paired, -1, axis=1)], axis=2)
+        counts.append(np.full(num_copies * hole_size, 4, dtype=np.int64))
+        face_vertices.append(bridges.ravel())
+        corner_uvs.append(np.full(bridges.size, -1, dtype=np.int64))
+        # Bridges take the material of the faces they replace around the source vertex
+        shading_groups.append(np.full(num_copies * hole_size, source_groups[source_faces[0]], dtype=object))
+    else:
+        # Snapping the source holes onto the destination holes so the weld merges them
+        copy_points[np.arange(num_copies)[:, None], source_hole] = dest_points[paired]
+
+    counts = np.concatenate(counts)
+    corner_faces = np.repeat(np.arange(len(counts)), counts)
+    face_offsets = np.concatenate([[0], np.cumsum(counts)])
+    points = np.concatenate([dest_points, copy_points.reshape(-1, 3)])
+    points, face_offsets, face_vertices, corners = weld_points(points, face_offsets, np.concatenate(face_vertices), tolerance)
+    shading_groups = np.concatenate(shading_groups)[corner_faces[corners][face_offsets[:-1]]]
+
+    uv_counts, uv_ids = get_assigned_uvs(face_offsets, np.concatenate(corner_uvs)[corners])
+
+    # The welded mesh takes the place of the destination objects
+    cmds.delete(*dest_objs)
+    new_obj = create_mesh(dest_objs[0], points, face_offsets, face_vertices, np.concatenate(uvs), uv_counts, uv_ids)
+    assign_face_shading_groups(new_obj, shading_groups)
+    return new_obj
+
+def allign_and_weld_multiple(source_vert, dest_verts, reference_face_area, local_y_flip=False, maintain_source_shape=False, tolerance=0.001, bulk=False):
     """Alligns and welds multiple copies of the same source object to specified destinations
 
     Args:
         source_vert (str): source vertex to allign and weld along destination verts
-        dest_verts (str[]): list of vertices to be used as destinations
+        dest_verts (str[]): vertices to be used as destinations, packed names or ComponentSelections
         reference_face_area (float): reference face area for relative resizing
         local_y_flip (bool): whether to flip source object along it's Y axis once alligned
         maintain_source_shape (bool): maintain the shape of the source object by leaving a bridge between the two borders
+        tolerance (float): maximum distance between a vertex and a stored position for them to match
+        bulk (bool): place every copy at once with allign_and_weld_bulk instead of one at a time
 
     Returns:
         None
     """
 
+    if bulk:
+        allign_and_weld_bulk(source_vert, dest_verts, reference_face_area, local_y_flip, maintain_source_shape, tolerance)
+        return
+
     obj_name = source_vert.split(".")[0]
-    vert_id = int("".join([i for i in source_vert.split(".")[1] if i in string.digits]))
+    vert_id = int(ComponentSelection.from_name(source_vert).ids[0])
+    dest_verts = [i for selection in ComponentSelection.from_names(dest_verts) for i in selection]
+
+    # Computing the orientation of every copy in one go
+    source_normal = cmds.polyNormalPerVertex(source_vert, query=True, xyz=True)[:3]
+    dest_normals = [cmds.polyNormalPerVertex(i, query=True, xyz=True)[:3] for i in dest_verts]
+    _, rotations, _ = get_alignments(source_normal, dest_normals)
 
     # Alligning all the copies to the destinations
     faces = []
     objs = set()
     source_positions_2D = []
     dest_positions_2D = []
-    for dest_vert in dest_verts:
+    for dest_vert, rotation in zip(dest_verts, rotations):
         new_obj = cmds.duplicate(obj_name)[0]
         new_vert = "{}.vtx[{}]".format(new_obj, vert_id)
-        obj1, obj2, sp, dp, ftd = allign_and_cache_weld_positions(new_vert, dest_vert, reference_face_area, local_y_flip)
+        obj1, obj2, sp, dp, ftd = allign_and_cache_weld_positions(new_vert, dest_vert, reference_face_area, local_y_flip, rotation)
         objs.add(obj1)
         objs.add(obj2)
         source_positions_2D.append(sp)
@@ -184,13 +400,14 @@ def allign_and_weld_multiple(source_vert, dest_verts, reference_face_area, local
     # Merging and welding copies to destination object
     cmds.delete(*faces)
     new_obj, _ = cmds.polyUnite(list(objs))
-    weld_all(new_obj, source_positions_2D, dest_positions_2D)
-
-# Select all destination verts and run this line
-dest_verts = unpack_selection_items(cmds.ls(selection=True))
-# Select source vertex and run this line
-source_vert = cmds.ls(selection=True)[0]
-# Select one face on the bottom of the source object and run this line
-reference_face_area = cmds.polyEvaluate(cmds.ls(selection=True)[0], wfa=True)[0]
-# Run this line to execute
-allign_and_weld_multiple(source_vert, dest_verts, reference_face_area, local_y_flip=True)
+    weld_all(new_obj, source_positions_2D, dest_positions_2D, maintain_source_shape, tolerance)
+
+if __name__ == "__main__":
+    # Select all destination verts and run this line
+    dest_verts = cmds.ls(selection=True)
+    # Select source vertex and run this line
+    source_vert = cmds.ls(selection=True)[0]
+    # Select one face on the bottom of the source object and run this line
+    reference_face_area = cmds.polyEvaluate(cmds.ls(selection=True)[0], wfa=True)[0]
+    # Run this line to execute
+    allign_and_weld_multiple(source_vert, dest_verts, reference_face_area, local_y_flip=True)
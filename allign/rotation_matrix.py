@@ -15,7 +15,14 @@ def get_rotation_matrix(f, t):
     """Get rotation matrix from one vector (f) to another (t)"""
     v = crossp(f, t)
     c = dotp(f, t)
-    h = (1 - c) / (1 - (c ** 2))
+    if c < -1 + 1e-9:
+        # Opposite vectors, half turn around any axis perpendicular to f
+        axis = crossp(f, (1, 0, 0) if abs(f[0]) < 0.9 else (0, 1, 0))
+        length = math.sqrt(dotp(axis, axis))
+        axis = [i / length for i in axis]
+        return [[2*a*b - (i == j) for j, b in enumerate(axis)] for i, a in enumerate(axis)]
+    # (1 - c) / (1 - c^2) simplified so parallel vectors don't divide by zero
+    h = 1 / (1 + c)
     vx, vy, vz = v
     rotation_matrix = [
             [c + h*vx**2, h*vx*vy - vz, h*vx*vz + vy],
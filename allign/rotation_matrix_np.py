@@ -1,20 +1,15 @@
 import math
 import numpy as np
 
+# normalize comes from utils, which has to be loaded in the session first like it is for allign
+
+# Below this the vectors are treated as pointing in opposite directions
+OPPOSITE_EPS = 1e-9
+
 # https://cs.brown.edu/research/pubs/pdfs/1999/Moller-1999-EBA.pdf
 def get_rotation_matrix(f, t):
     """Get rotation matrix from one vector (f) to another (t)"""
-    v = np.cross(f, t)
-    u = v / np.linalg.norm(v)
-    c = np.dot(f, t)
-    h = (1 - c) / (1 - (c ** 2))
-    vx, vy, vz = v
-    rotation_matrix = [
-            [c + h*vx**2, h*vx*vy - vz, h*vx*vz + vy],
-            [h*vx*vy+vz, c+h*vy**2, h*vy*vz-vx],
-            [h*vx*vz - vy, h*vy*vz + vx, c+h*vz**2]
-    ]
-    return np.array(rotation_matrix)
+    return get_rotation_matrices([f], [t])[0]
 
 # https://www.learnopencv.com/rotation-matrix-to-euler-angles/
 def rotation_matrix_to_euler(R):
@@ -34,3 +29,67 @@ def rotation_matrix_to_euler(R):
  
     return np.array([x, y, z])
 
+
+def get_perpendiculars(vectors):
+    """Returns a unit vector perpendicular to each of the Nx3 unit vectors"""
+    # Crossing with whichever axis the vector is least aligned with
+    axes = np.eye(3)[np.abs(vectors).argmin(axis=1)]
+    return normalize(np.cross(vectors, axes))
+
+
+def get_rotation_matrices(f, t):
+    """Get the Nx3x3 rotation matrices from each of the Nx3 vectors in f to the matching vector in t
+
+    Parallel vectors get the identity, opposite vectors get a half turn around an axis perpendicular to f
+    """
+    f, t = normalize(f), normalize(t)
+    v = np.cross(f, t)
+    c = np.einsum("ij,ij->i", f, t)
+    opposite = c < -1 + OPPOSITE_EPS
+
+    # (1 - c) / (1 - c^2) simplified so parallel vectors don't divide by zero
+    h = 1 / np.where(opposite, 1, 1 + c)
+    vx, vy, vz = v.T
+    R = np.empty((len(f), 3, 3))
+    R[:, 0] = np.stack([c + h*vx**2, h*vx*vy - vz, h*vx*vz + vy], axis=1)
+    R[:, 1] = np.stack([h*vx*vy + vz, c + h*vy**2, h*vy*vz - vx], axis=1)
+    R[:, 2] = np.stack([h*vx*vz - vy, h*vy*vz + vx, c + h*vz**2], axis=1)
+
+    if opposite.any():
+        axis = get_perpendiculars(f[opposite])
+        R[opposite] = 2 * axis[:, :, None] * axis[:, None, :] - np.eye(3)
+    return R
+
+
+def rotation_matrices_to_euler(R):
+    """Convert Nx3x3 rotation matrices (R) to Nx3 euler [x, y, z] radians"""
+    R = np.asarray(R, dtype=np.float64).reshape(-1, 3, 3)
+    sy = np.sqrt(R[:, 0, 0] ** 2 + R[:, 1, 0] ** 2)
+    singular = sy < 1e-6
+    x = np.where(singular, np.arctan2(-R[:, 1, 2], R[:, 1, 1]), np.arctan2(R[:, 2, 1], R[:, 2, 2]))
+    y = np.arctan2(-R[:, 2, 0], sy)
+    z = np.where(singular, 0, np.arctan2(R[:, 1, 0], R[:, 0, 0]))
+    return np.stack([x, y, z], axis=1)
+
+
+def get_quaternions(f, t):
+    """Get the Nx4 [x, y, z, w] quaternions (MQuaternion order) rotating each vector in f to the matching vector in t"""
+    f, t = normalize(f), normalize(t)
+    c = np.einsum("ij,ij->i", f, t)
+    q = np.concatenate([np.cross(f, t), (1 + c)[:, None]], axis=1)
+    opposite = c < -1 + OPPOSITE_EPS
+    if opposite.any():
+        q[opposite] = np.concatenate([get_perpendiculars(f[opposite]), np.zeros((opposite.sum(), 1))], axis=1)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def get_alignments(f, t):
+    """Get the rotation matrices, euler [x, y, z] degrees and quaternions aligning every vector in f to t
+
+    A single f vector is broadcast against all of t
+    """
+    f = np.asarray(f, dtype=np.float64).reshape(-1, 3)
+    t = np.asarray(t, dtype=np.float64).reshape(-1, 3)
+    f = np.broadcast_to(f, t.shape) if len(f) == 1 else f
+    R = get_rotation_matrices(f, t)
+    return R, np.degrees(rotation_matrices_to_euler(R)), get_quaternions(f, t)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from allign import find_hole, index_border_loops, pair_holes, select_faces
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils import MeshTopology
+
+
+def grid(size):
+    """A flat size x size vertex grid in XZ with it's faces pointing up"""
+    x, z = np.meshgrid(np.arange(size, dtype=np.float64), np.arange(size, dtype=np.float64))
+    points = np.stack([x.ravel(), np.zeros(size * size), z.ravel()], axis=1)
+    corners = np.arange(size * size).reshape(size, size)[:-1, :-1].ravel()
+    face_vertices = np.stack([corners, corners + size, corners + size + 1, corners + 1], axis=1).ravel()
+    return points, np.arange(0, len(face_vertices) + 1, 4), face_vertices
+
+
+def hole_around(face_offsets, face_vertices, num_verts, vert_id, reverse=False):
+    """The hole deleting the faces around vert_id leaves, the way allign_and_weld_bulk finds it"""
+    (faces,), (border,) = MeshTopology(num_verts, face_offsets, face_vertices).vertex_neighbourhoods([vert_id])
+    kept = np.setdiff1d(np.arange(len(face_offsets) - 1), faces)
+    offsets, corners = select_faces(face_offsets, kept, reverse=reverse)
+    border_loops, loop_index = index_border_loops(MeshTopology(num_verts, offsets, face_vertices[corners]))
+    return find_hole(border_loops, loop_index, border, "vtx[{}]".format(vert_id))
+
+
+@pytest.mark.parametrize("local_y_flip", [False, True])
+def test_pair_holes_lying_on_destination(local_y_flip):
+    # A 5x5 copy laid exactly onto the middle of a 9x9 destination, the holes line up vertex for vertex
+    source_points, source_offsets, source_faces = grid(5)
+    dest_points, dest_offsets, dest_faces = grid(9)
+    source_hole = hole_around(source_offsets, source_faces, len(source_points), 12, reverse=local_y_flip)
+    dest_hole = hole_around(dest_offsets, dest_faces, len(dest_points), 40)
+    copy_points = source_points - source_points[12] + dest_points[40]
+
+    order = pair_holes(copy_points[source_hole][None], dest_points[dest_hole][None])
+    assert np.allclose(copy_points[source_hole], dest_points[dest_hole[order[0]]])
@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+
+# Times utils.parse_polyinfo against the line by line parser format_polyinfo used to be,
+# on synthetic polyInfo output for a mesh of a million faces (fv, fn and ev)
+#
+#   python bench_polyinfo.py [num_faces]
+
+import string
+import sys
+import time
+
+import numpy as np
+
+from utils import parse_polyinfo
+
+
+def format_polyinfo_lines(polyinfo_output, flt=True):
+    """The previous format_polyinfo, which filtered and converted every line on it's own"""
+    out = []
+    for s in polyinfo_output:
+        ascii_filtered = "".join([i for i in s if i not in string.ascii_letters])
+        formatted = ascii_filtered.split(":")[1].split(" ")
+        empty_strings_filtered = filter(None, formatted)
+        newline_filtered = [i for i in empty_strings_filtered if i != u"\n"]
+        converted = [float(i) if flt else int(i) for i in newline_filtered]
+        out.append(converted)
+    return out
+
+
+def synthetic_polyinfo(num_faces, seed=0):
+    """Lines laid out like polyInfo prints them for face vertices, face normals and edge vertices"""
+    rng = np.random.default_rng(seed)
+    fv = ["FACE {:6d}: {} \n".format(i, " ".join("{:6d}".format(v) for v in rng.integers(0, num_faces, rng.integers(3, 6))))
+          for i in range(num_faces)]
+    fn = ["FACE_NORMAL {:6d}: {:f} {:f} {:f}\n".format(i, *rng.normal(size=3)) for i in range(num_faces)]
+    ev = ["EDGE {:6d}: {:6d} {:6d}  {}\n".format(i, i, i + 1, "Hard" if i % 2 else "Soft") for i in range(num_faces)]
+    return [("fv", fv, False), ("fn", fn, True), ("ev", ev, False)]
+
+
+def main(num_faces=1000000):
+    for name, lines, flt in synthetic_polyinfo(num_faces):
+        start = time.perf_counter()
+        _, offsets, values = parse_polyinfo(lines, flt=flt)
+        parsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = format_polyinfo_lines(lines, flt=flt)
+        per_line = time.perf_counter() - start
+
+        same = (np.array_equal(np.diff(offsets), [len(i) for i in expected])
+                and np.allclose(values, np.concatenate([np.array(i, dtype=np.float64) for i in expected])))
+        print("{}: parse_polyinfo {:.2f}s, line by line {:.2f}s, {:.1f}x, {}".format(
+            name, parsed, per_line, per_line / parsed, "same values" if same else "VALUES DIFFER"))
+
+
+if __name__ == "__main__":
+    main(*[int(i) for i in sys.argv[1:]])
@@ -8,80 +8,231 @@
 # https://forums.chaosgroup.com/forum/v-ray-for-maya-forums/v-ray-for-maya-problems/1011428-set-rect-light-target-position-via-python
 
 import math
-from collections import deque
 import json
 import os
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import cv2
 
+from rgbe import RGBEReader, RGBEWriter
+
 
 def get_bright_spots(mat, threshold=0.7, blur_radius=23):
     gray = cv2.cvtColor(mat, cv2.COLOR_BGR2GRAY)
     gauss = cv2.GaussianBlur(gray, (blur_radius,)*2 , 0)
-    canvas = np.zeros_like(gray)
-    for row, col in zip(*np.where(gauss > threshold)):
-        canvas[row][col] = 1
-    return canvas
-
-
-def get_neighbors(idx, radius=1):
-    row, col = idx
-    neighbors = []
-    for i in range(1, radius + 1):
-        neighbors.append((row - i, col))
-        neighbors.append((row, col - i))
-        neighbors.append((row - i, col - i))
-        neighbors.append((row + i, col))
-        neighbors.append((row, col + i))
-        neighbors.append((row + i, col + i))
-        neighbors.append((row + i, col - i))
-        neighbors.append((row - i, col + i))
-    return neighbors
-
-
-# TODO: speed this up
+    return (gauss > threshold).astype(np.uint8)
+
+
+def get_bright_spots_streamed(reader, threshold=0.7, blur_radius=23, band_rows=256):
+    """Same as get_bright_spots, but only holds a band of the HDR in memory at a time
+
+    Each band is blurred together with the rows around it, so the mask matches blurring the full image.
+    """
+    rows, _ = reader.shape
+    pad = blur_radius // 2
+    mask = np.zeros(reader.shape, dtype=np.uint8)
+    carry = None
+    written = 0
+    for start, band in reader.bands(band_rows):
+        gray = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY)
+        window = gray if carry is None else np.vstack([carry, gray])
+        window_start = start + len(band) - len(window)
+        window_stop = start + len(band)
+        gauss = cv2.GaussianBlur(window, (blur_radius,)*2 , 0)
+
+        # Rows near the bottom of the window are missing neighbors until the next band comes in
+        valid_stop = window_stop if window_stop == rows else window_stop - pad
+        if valid_stop > written:
+            mask[written:valid_stop] = gauss[written - window_start:valid_stop - window_start] > threshold
+            written = valid_stop
+        carry = window[-2 * pad:] if pad else None
+    return mask
+
+
+class Cluster:
+    """Pixels of a single light, stored as coordinates instead of a full frame mask
+
+    Args:
+        rows (np.ndarray): row of every pixel, in row major order
+        cols (np.ndarray): column of every pixel
+    """
+    __slots__ = ("rows", "cols")
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return f"Cluster({len(self)} pixels, bbox: {self.bbox})"
+
+    @property
+    def bbox(self):
+        """Returns (row1, col1, row2, col2) with exclusive ends"""
+        return (int(self.rows[0]), int(self.cols.min()), int(self.rows[-1]) + 1, int(self.cols.max()) + 1)
+
+    def to_mask(self, shape):
+        """Draws the cluster onto a full frame mask"""
+        mask = np.zeros(shape, dtype=np.uint8)
+        mask[self.rows, self.cols] = 1
+        return mask
+
+
+# Maps pixels to (line index, position on that line) for every line a neighbor can be on,
+# opposite directions share a line family
+LINE_FAMILIES = (
+    lambda rows, cols: (rows, cols),        # Horizontal
+    lambda rows, cols: (cols, rows),        # Vertical
+    lambda rows, cols: (cols - rows, rows), # Diagonal
+    lambda rows, cols: (cols + rows, rows), # Anti-diagonal
+)
+
+
+def get_line_runs(rows, cols, radius):
+    """Splits mask pixels into runs along each line family
+
+    Two mask pixels are neighbors when they're on the same row, column or diagonal and at most radius pixels apart,
+    so consecutive pixels on a line that are close enough belong to the same run.
+
+    Returns:
+        A list of (order, starts) pairs per line family, pixels[order] is sorted by run and starts are the run offsets
+    """
+    runs = []
+    span = int(max(rows.max(), cols.max())) * 2 + 2
+    for family in LINE_FAMILIES:
+        line, pos = family(rows, cols)
+        order = np.argsort(line * span + pos, kind="stable")
+        line, pos = line[order], pos[order]
+        breaks = (np.diff(line) != 0) | (np.diff(pos) > radius)
+        starts = np.concatenate([[0], np.flatnonzero(breaks) + 1])
+        runs.append((order, starts))
+    return runs
+
+
+def label_components(num_nodes, links):
+    """Labels every node with the lowest node id of it's connected component
+
+    Union find over the 2xN links with array operations: every round hooks the larger root of each link onto
+    the smaller one, then pointer jumping flattens the trees. Roots only ever point at lower ids, so the rounds
+    needed grow with the log of the component size rather than it's diameter.
+    """
+    parents = np.arange(num_nodes)
+    a, b = links
+    while True:
+        root_a, root_b = parents[a], parents[b]
+        apart = root_a != root_b
+        if not apart.any():
+            return parents
+        np.minimum.at(parents, np.maximum(root_a, root_b)[apart], np.minimum(root_a, root_b)[apart])
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+
+
 def cluster_pixels(mask, min_cluster_size=300, min_neighbor_dist=20):
-    visited = np.zeros_like(mask)
-    rows, cols = mask.shape
-    queue = deque([])
+    """Groups mask pixels into clusters of pixels that are within min_neighbor_dist of each other
+
+    Pixels only neighbor each other along rows, columns and diagonals, clusters are returned in the order
+    a row major scan would first reach them.
+    """
+    rows, cols = np.nonzero(mask == 1)
+    if not len(rows):
+        return []
+
+    # Linking consecutive pixels of every run, then labelling each cluster with it's lowest raster index
+    links = []
+    for order, starts in get_line_runs(rows, cols, min_neighbor_dist):
+        linked = np.ones(len(order) - 1, dtype=bool)
+        linked[starts[1:] - 1] = False
+        links.append(np.stack([order[:-1][linked], order[1:][linked]]))
+    labels = label_components(len(rows), np.concatenate(links, axis=1))
+
+    # Grouping pixels by label, the stable sort keeps each cluster in row major order
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind="stable")
+    rows, cols = rows[order].astype(np.int32), cols[order].astype(np.int32)
     clusters = []
-    for row in range(rows):
-        for col in range(cols):
-
-            # Starting the search if the pixel is part of the original mask, and not visited
-            if mask[row][col] == 1 and visited[row][col] == 0:
-                cluster_mask = np.zeros_like(mask) # Creating a seperate mask for each cluster
-                visited[row][col] = 1
-                queue.append((row, col))
-                cluster_mask[row][col] = 1
-            else:
-                continue
-
-            cluster_size = 0
-            while queue:
-                pixel_idx = queue.pop()
-                neighbors = get_neighbors(pixel_idx, radius=min_neighbor_dist)
-                for idx in neighbors:
-                    row_, col_ = idx
-                    if mask[row_][col_] == 1 and visited[row_][col_] == 0:
-                        visited[row_][col_] = 1
-                        queue.append((row_, col_))
-                        cluster_mask[row_][col_] = 1
-                        cluster_size += 1
-
-            if cluster_size > min_cluster_size:
-                clusters.append(cluster_mask)
+    for start, count in zip(np.cumsum(counts) - counts, counts):
+        # The pixel a cluster was started from isn't counted towards it's size
+        if count - 1 > min_cluster_size:
+            clusters.append(Cluster(rows[start:start + count], cols[start:start + count]))
 
     return clusters
 
 
-def get_rect_points(mask):
-    points = cv2.findNonZero(mask)
-    x1, y1, w, h = cv2.boundingRect(points)
-    x2, y2 = ((x1 + w), y1)
-    x3, y3 = (x1 + w, y1 + h)
-    x4, y4 = (x1, (y1 + h))
+def merge_regions(regions):
+    """Merges overlapping (row1, col1, row2, col2) regions until none of them overlap"""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for region in regions:
+            for idx, other in enumerate(out):
+                if region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]:
+                    out[idx] = (min(region[0], other[0]), min(region[1], other[1]),
+                                max(region[2], other[2]), max(region[3], other[3]))
+                    merged = True
+                    break
+            else:
+                out.append(region)
+        regions = out
+    return regions
+
+
+def detect_lights(mat, threshold=0.7, blur_radius=23, min_cluster_size=300, min_neighbor_dist=20, pyramid_levels=0):
+    """Finds the clusters of bright pixels in an HDR
+
+    With pyramid_levels > 0 candidate regions are detected on a downsampled level of the image first,
+    and only those regions are blurred, thresholded and clustered at full resolution.
+    """
+    if not pyramid_levels:
+        return cluster_pixels(get_bright_spots(mat, threshold, blur_radius), min_cluster_size, min_neighbor_dist)
+
+    small = mat
+    for _ in range(pyramid_levels):
+        small = cv2.pyrDown(small)
+    scale = 2 ** pyramid_levels
+
+    # Being lenient with the coarse level, anything too small gets filtered out at full resolution
+    small_mask = get_bright_spots(small, threshold, max(1, blur_radius // scale) | 1)
+    candidates = cluster_pixels(small_mask, min_cluster_size // (2 * scale ** 2), max(1, min_neighbor_dist // scale))
+
+    rows, cols = mat.shape[:2]
+    margin = min_neighbor_dist + scale
+    regions = []
+    for candidate in candidates:
+        r1, c1, r2, c2 = candidate.bbox
+        regions.append((max(0, r1 * scale - margin), max(0, c1 * scale - margin),
+                        min(rows, r2 * scale + margin), min(cols, c2 * scale + margin)))
+
+    # Padding each region by the blur kernel so the blur inside the region matches the full image
+    pad = blur_radius // 2
+    clusters = []
+    for r1, c1, r2, c2 in merge_regions(regions):
+        pr1, pc1 = max(0, r1 - pad), max(0, c1 - pad)
+        pr2, pc2 = min(rows, r2 + pad), min(cols, c2 + pad)
+        mask = get_bright_spots(mat[pr1:pr2, pc1:pc2], threshold, blur_radius)
+        mask = mask[r1 - pr1:r2 - pr1, c1 - pc1:c2 - pc1]
+        for cluster in cluster_pixels(mask, min_cluster_size, min_neighbor_dist):
+            clusters.append(Cluster(cluster.rows + r1, cluster.cols + c1))
+
+    # Matching the row major order of the full resolution path
+    clusters.sort(key=lambda cluster: (cluster.rows[0], cluster.cols[0]))
+    return clusters
+
+
+def get_rect_points(cluster):
+    y1, x1, y3, x3 = cluster.bbox
+    x2, y2 = (x3, y1)
+    x4, y4 = (x1, y3)
     mid_x, mid_y = ((x1 + x3) // 2 , (y1 + y3) // 2)
 
     # Returning coords in row major order (numpy)
@@ -112,48 +263,273 @@ def fit_to_uv(mat_size, points):
     uv_ordered = [(col, 1 - row) for row, col in uv_normalized]
     return uv_ordered
 
-def crop(image, bbox):
-    tl, _, br, _ = bbox
-    x1, y1 = tl
-    x2, y2 = br
+def crop(image, cluster):
+    x1, y1, x2, y2 = cluster.bbox
     return image[x1:x2, y1:y2]
 
 # TODO: Make this return a copy of the image instaed of modifying it 
-def fill(image, bbox, value=0):
-    tl, _, br, _ = bbox
-    x1, y1 = tl
-    x2, y2 = br
+def fill(image, cluster, value=0):
+    x1, y1, x2, y2 = cluster.bbox
     image[x1:x2, y1:y2] = value
 
-def main(hdr_path):
-    hdr = cv2.imread(hdr_path, -1)
-    mask = get_bright_spots(hdr)
-    clusters = cluster_pixels(mask)
-    data = {}
+def get_row_solid_angles(rows, cols):
+    """Returns the solid angle covered by one pixel of each row of an equirectangular image"""
+    latitude = (0.5 - (np.arange(rows) + 0.5) / rows) * math.pi
+    return np.cos(latitude) * (2 * math.pi / cols) * (math.pi / rows)
+
+
+def get_energy_table(mat):
+    """Builds a summed-area table of luminance weighted by each pixel's solid angle
+
+    The table is one row and column bigger than the image, the energy of any rectangle is then 4 lookups.
+    """
+    gray = cv2.cvtColor(mat, cv2.COLOR_BGR2GRAY)
+    weighted = gray * get_row_solid_angles(*gray.shape)[:, None]
+    return cv2.integral(weighted, sdepth=cv2.CV_64F)
+
+
+def rect_energy(table, bbox):
+    """Returns the energy of a (row1, col1, row2, col2) rectangle from a table made by get_energy_table"""
+    r1, c1, r2, c2 = bbox
+    return table[r2, c2] - table[r1, c2] - table[r2, c1] + table[r1, c1]
+
+
+def band_energies(band, start, clusters, row_solid_angles):
+    """Returns how much energy a band of rows adds to each cluster's rectangle, for when no table fits in memory"""
+    gray = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY) * row_solid_angles[start:start + len(band), None]
+    energies = np.zeros(len(clusters))
     for idx, cluster in enumerate(clusters):
+        x1, y1, x2, y2 = cluster.bbox
+        lo, hi = max(x1, start), min(x2, start + len(band))
+        if lo < hi:
+            energies[idx] = gray[lo - start:hi - start, y1:y2].sum()
+    return energies
+
+
+def rank_lights(energies, max_lights=None):
+    """Returns the indices of the max_lights most energetic lights, in their original order"""
+    ranked = np.argsort(-np.asarray(energies), kind="stable")
+    return sorted(ranked[:max_lights].tolist())
+
+
+def get_light_info(cluster, energy, row_solid_angles):
+    """Returns the energy, solid angle and average radiance of a light's rectangle"""
+    x1, y1, x2, y2 = cluster.bbox
+    solid_angle = float((y2 - y1) * row_solid_angles[x1:x2].sum())
+    return {"energy": energy, "solid_angle": solid_angle, "radiance": energy / solid_angle}
+
+
+def stream_lights(hdr_path, patched_path, threshold=0.7, blur_radius=23, min_cluster_size=300, min_neighbor_dist=20,
+                  max_lights=None, band_rows=256):
+    """Finds, crops and patches out the lights of an HDR without loading all of it
+
+    The HDR is read twice, once to find the lights and once to copy their crops and write the patched HDR.
+    Ranking the lights for max_lights takes an extra read in between.
+
+    Returns:
+        shape (int, int): rows and columns of the HDR
+        clusters (Cluster[]): clusters of every light
+        crops (np.ndarray[]): float32 BGR crop of every light
+        energies (np.ndarray): solid angle weighted energy of every light's rectangle
+    """
+    with RGBEReader(hdr_path) as reader:
+        mask = get_bright_spots_streamed(reader, threshold, blur_radius, band_rows)
+        clusters = cluster_pixels(mask, min_cluster_size, min_neighbor_dist)
+        del mask
+
+        row_solid_angles = get_row_solid_angles(*reader.shape)
+        energies = np.zeros(len(clusters))
+        if max_lights is not None:
+            for start, band in reader.bands(band_rows):
+                energies += band_energies(band, start, clusters, row_solid_angles)
+            keep = rank_lights(energies, max_lights)
+            clusters, energies = [clusters[i] for i in keep], energies[keep]
+            measured = True
+        else:
+            measured = False
+
+        crops = []
+        for cluster in clusters:
+            x1, y1, x2, y2 = cluster.bbox
+            crops.append(np.zeros((x2 - x1, y2 - y1, 3), dtype=np.float32))
+
+        with RGBEWriter(patched_path, reader.shape) as writer:
+            for start, band in reader.bands(band_rows):
+                stop = start + len(band)
+                if not measured:
+                    energies += band_energies(band, start, clusters, row_solid_angles)
+                # Cropping and filling in order, so overlapping lights see the previous fills like in main
+                for cluster, cropped in zip(clusters, crops):
+                    x1, y1, x2, y2 = cluster.bbox
+                    lo, hi = max(x1, start), min(x2, stop)
+                    if lo < hi:
+                        cropped[lo - x1:hi - x1] = band[lo - start:hi - start, y1:y2]
+                        band[lo - start:hi - start, y1:y2] = 0
+                writer.write(band)
+
+        return reader.shape, clusters, crops, energies
+
+def main(hdr_path, pyramid_levels=0, stream=False, out_dir=None, threshold=0.7, blur_radius=23,
+         min_cluster_size=300, min_neighbor_dist=20, max_lights=None):
+    out_dir = os.path.abspath(out_dir or os.getcwd())
+    params = dict(threshold=threshold, blur_radius=blur_radius,
+                  min_cluster_size=min_cluster_size, min_neighbor_dist=min_neighbor_dist)
+    patched_path = os.path.join(out_dir, "patched_hdr.hdr")
+    # The pyramid needs random access to full resolution regions, which streaming avoids on purpose
+    if stream and pyramid_levels:
+        raise Exception("pyramid_levels can't be used with stream, the streamed mask is already built band by band")
+    if stream:
+        shape, clusters, crops, energies = stream_lights(hdr_path, patched_path, max_lights=max_lights, **params)
+    else:
+        hdr = cv2.imread(hdr_path, -1)
+        if hdr is None:
+            raise Exception(f"Couldn't read {hdr_path}")
+        shape = hdr.shape[:2]
+        clusters = detect_lights(hdr, pyramid_levels=pyramid_levels, **params)
+
+        # Measuring every light before any of them are filled, then keeping the strongest
+        table = get_energy_table(hdr)
+        energies = np.array([rect_energy(table, cluster.bbox) for cluster in clusters])
+        del table
+        keep = rank_lights(energies, max_lights)
+        clusters, energies = [clusters[i] for i in keep], energies[keep]
+
+        crops = []
+        for cluster in clusters:
+            crops.append(crop(hdr, cluster).copy())
+            fill(hdr, cluster)
+        cv2.imwrite(patched_path, hdr)
+
+    row_solid_angles = get_row_solid_angles(*shape)
+    data = {}
+    for idx, (cluster, cropped, energy) in enumerate(zip(clusters, crops, energies)):
         pt1, pt2, pt3, pt4, mid = get_rect_points(cluster)
 
-        pt1_uv, pt2_uv, pt3_uv, pt4_uv, mid_uv = fit_to_uv(cluster.shape, [pt1, pt2, pt3, pt4, mid])
-        
-        cropped = crop(hdr, [pt1, pt2, pt3, pt4])
+        pt1_uv, pt2_uv, pt3_uv, pt4_uv, mid_uv = fit_to_uv(shape, [pt1, pt2, pt3, pt4, mid])
         
-        path = f"{os.getcwd()}\\rect_tex_{idx}.hdr"
+        path = os.path.join(out_dir, f"rect_tex_{idx}.hdr")
         cv2.imwrite(path, cropped)
 
         data[str(idx)] = {
                 "bbox_points": [pt1_uv, pt2_uv, pt3_uv, pt4_uv],
                 "mid_point": mid_uv,
-                "rect_tex": path
+                "rect_tex": path,
+                **get_light_info(cluster, float(energy), row_solid_angles)
                 }
 
-        fill(hdr, [pt1, pt2, pt3, pt4])
-
-    path = f"{os.getcwd()}\\patched_hdr.hdr"
-    cv2.imwrite(path, hdr)
-    data["hdr"] = path
+    data["hdr"] = patched_path
     data["num_lights"] = len(clusters)
+    data["max_lights"] = max_lights
 
-    with open("extract-hdri.json", "w+") as f:
+    with open(os.path.join(out_dir, "extract-hdri.json"), "w+") as f:
         json.dump(data, f)
-
-main("hdr.hdr")
+    return data
+
+
+def get_file_hash(path):
+    """Hashes the contents of a file"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def get_cache_key(source_hash, params):
+    """Combines the hash of an HDR's contents with the parameters it's extracted with"""
+    return hashlib.sha256((source_hash + json.dumps(params, sort_keys=True)).encode()).hexdigest()
+
+
+def stat_matches(data, source_stat):
+    """Checks if an HDR still has the size and mtime recorded when it was last extracted or hashed"""
+    return data.get("source_size") == source_stat.st_size and data.get("source_mtime") == source_stat.st_mtime_ns
+
+
+def is_cache_valid(data, hdr_path, params, source_stat):
+    """Checks that a previous extraction still has all of it's outputs on disk and came from the same contents and parameters
+
+    The recorded hash is trusted while the HDR's size and mtime haven't changed, so unchanged files aren't read again.
+    A touched or copied HDR is hashed and only counts as changed if it's contents did.
+    """
+    paths = [data.get("hdr")] + [data.get(str(idx), {}).get("rect_tex") for idx in range(data.get("num_lights", 0))]
+    if "source_hash" not in data or not all(path and os.path.exists(path) for path in paths):
+        return False
+    source_hash = data["source_hash"] if stat_matches(data, source_stat) else get_file_hash(hdr_path)
+    return data.get("cache_key") == get_cache_key(source_hash, params)
+
+
+def extract_cached(hdr_path, out_dir, params):
+    """Runs main on a single HDR unless out_dir already holds complete results for the same file and parameters
+
+    Returns:
+        A report entry with the status (cached, extracted or failed), timing and number of lights
+    """
+    start = time.perf_counter()
+    entry = {"hdr": hdr_path, "out_dir": out_dir}
+    try:
+        source_stat = os.stat(hdr_path)
+        json_path = os.path.join(out_dir, "extract-hdri.json")
+        if os.path.exists(json_path):
+            with open(json_path, "r") as f:
+                data = json.load(f)
+            if is_cache_valid(data, hdr_path, params, source_stat):
+                if not stat_matches(data, source_stat):
+                    # Recording the new size and mtime so the file isn't hashed again next time
+                    data.update(source_size=source_stat.st_size, source_mtime=source_stat.st_mtime_ns)
+                    with open(json_path, "w+") as f:
+                        json.dump(data, f)
+                entry.update(status="cached", num_lights=data["num_lights"], seconds=time.perf_counter() - start)
+                return entry
+
+        source_hash = get_file_hash(hdr_path)
+        os.makedirs(out_dir, exist_ok=True)
+        data = main(hdr_path, out_dir=out_dir, **params)
+        # Only stamping the key once everything has been written, so interrupted runs are redone
+        data.update(cache_key=get_cache_key(source_hash, params), source_hash=source_hash,
+                    source_size=source_stat.st_size, source_mtime=source_stat.st_mtime_ns)
+        with open(json_path, "w+") as f:
+            json.dump(data, f)
+        entry.update(status="extracted", num_lights=data["num_lights"])
+    except Exception as e:
+        entry.update(status="failed", error=repr(e))
+    entry["seconds"] = time.perf_counter() - start
+    return entry
+
+
+def batch(hdr_dir, out_dir, workers=None, pyramid_levels=0, stream=False, threshold=0.7, blur_radius=23,
+          min_cluster_size=300, min_neighbor_dist=20, max_lights=None):
+    """Extracts the lights of every .hdr in hdr_dir across a process pool
+
+    Results for each HDR go to out_dir/<file name>/, and HDRs whose contents and parameters haven't changed
+    since the last run are skipped. A report with per-file timings is printed and written to out_dir.
+    """
+    if stream and pyramid_levels:
+        raise Exception("pyramid_levels can't be used with stream, the streamed mask is already built band by band")
+    params = dict(pyramid_levels=pyramid_levels, stream=stream, threshold=threshold, blur_radius=blur_radius,
+                  min_cluster_size=min_cluster_size, min_neighbor_dist=min_neighbor_dist, max_lights=max_lights)
+    names = sorted(i for i in os.listdir(hdr_dir) if i.lower().endswith(".hdr"))
+    paths = [os.path.join(hdr_dir, i) for i in names]
+    out_dirs = [os.path.join(out_dir, os.path.splitext(i)[0]) for i in names]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        report = list(pool.map(extract_cached, paths, out_dirs, [params] * len(paths)))
+    total = time.perf_counter() - start
+
+    for entry in report:
+        status = entry["status"] if entry["status"] != "failed" else f"failed: {entry['error']}"
+        print(f"{entry['seconds']:8.2f}s  {os.path.basename(entry['hdr'])}  {status}")
+    counts = {i: sum(entry["status"] == i for entry in report) for i in ("extracted", "cached", "failed")}
+    print(f"{len(report)} HDRs in {total:.2f}s: {counts['extracted']} extracted, "
+          f"{counts['cached']} cached, {counts['failed']} failed")
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "batch-report.json"), "w+") as f:
+        json.dump({"seconds": total, "files": report}, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main("hdr.hdr")
+    # Or to extract a whole directory of HDRs
+    # batch("hdris", "extracted")
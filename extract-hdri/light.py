@@ -1,24 +1,51 @@
 from __future__ import division
 
 import json
+import math
+import numpy as np
 import maya.cmds as cmds
 import mtoa.utils as mutils
 
 
-def get_uv_position(obj_name, coord):
-    cmds.select("{}.map[0:]".format(obj_name))
-    uv_positions = cmds.polyEditUV(q=True)
-    it = iter(uv_positions)
+# The proxy sphere lights used to be placed on was rotated 86.4 degrees, and the first UV column of its
+# 100 divisions sits one segment (3.6 degrees) further around, together they line up with the arnold dome light
+DOME_ROTATION = math.radians(86.4 + 360 / 100)
+
+
+def uv_to_world(uvs, radius=700):
+    """Maps equirectangular UVs to positions on a sphere around the origin, matching the arnold dome light
+
+    Args:
+        uvs (float[][]): ...x2 UV coordinates
+        radius (float): radius of the sphere
 
-    lowest_dist = 1
-    uv_idx = 0
-    for idx, pos in enumerate(zip(it, it)):
-        dist = distance_between(pos, coord)
-        if dist < lowest_dist:
-            lowest_dist = dist
-            uv_idx = idx
+    Returns:
+        np.ndarray: ...x3 world positions
+    """
+    uvs = np.asarray(uvs, dtype=np.float64)
+    # The UVs are flipped horizontally like polyFlipUV did on the proxy sphere
+    longitude = 2 * math.pi * (1 - uvs[..., 0]) + DOME_ROTATION
+    latitude = (uvs[..., 1] - 0.5) * math.pi
+    x = np.cos(latitude) * np.cos(longitude)
+    y = np.sin(latitude)
+    z = -np.cos(latitude) * np.sin(longitude)
+    return np.stack([x, y, z], axis=-1) * radius
 
-    return get_position("{}.map[{}]".format(obj_name, uv_idx))
+
+def get_uv_positions(obj_name, coords):
+    """Returns the world position of the UV closest to each coord on an object
+
+    The object's UV index is cached between calls and rebuilt when its topology or UVs change
+    """
+    index = get_uv_index(obj_name)
+    uv_ids = index.nearest(coords)
+    points = cmds.xform("{}.vtx[*]".format(obj_name), q=True, translation=True, ws=True)
+    points = np.reshape(points, (-1, 3))
+    return points[index.uv_vertices[uv_ids]].tolist()
+
+
+def get_uv_position(obj_name, coord):
+    return get_uv_positions(obj_name, [coord])[0]
 
 
 def place_light(pos, bbox_points, aim=(0,0,0)):
@@ -46,23 +73,25 @@ def resize_light(light, bbox_points, midpoint):
     cmds.scale(u_size, v_size, 1, light, r=True)
 
 
-def main(data_path, radius=700, divisions=100, intensity=15, exposure=11.5):
+def main(data_path, radius=700, intensity=15, exposure=11.5, uv_object=None):
     with open(data_path, "r") as f:
         data = json.load(f)
-    
-    sphere_name, _ = cmds.polySphere(radius=radius, sx=divisions, sy=divisions)
-    # Flipping UVs and rotating to match default arnold dome light position
-    cmds.select("{}.map[0:]".format(sphere_name))
-    cmds.polyFlipUV(usePivot=True, pivotU=0.5, pivotV=0.5)
-    cmds.setAttr("{}.rotateY".format(sphere_name), 86.4)
-
-    for i in range(data["num_lights"]):
-        bbox_points = data[str(i)]["bbox_points"]
-        mid_point = data[str(i)]["mid_point"]
+
+    # Placing every light's corners and midpoint in one go
+    num_lights = data["num_lights"]
+    uvs = np.reshape([data[str(i)]["bbox_points"] + [data[str(i)]["mid_point"]] for i in range(num_lights)], (-1, 2))
+    if uv_object is None:
+        world_points = uv_to_world(uvs, radius)
+    else:
+        # Resolving against the UVs of real geometry instead of a perfect sphere
+        world_points = get_uv_positions(uv_object, uvs)
+    world_points = np.reshape(world_points, (num_lights, 5, 3)).tolist()
+
+    for i in range(num_lights):
         tex_path = data[str(i)]["rect_tex"]
         
-        bbox_world = [get_uv_position(sphere_name, i) for i in bbox_points]
-        mid_pos = get_uv_position(sphere_name, mid_point)
+        bbox_world = world_points[i][:4]
+        mid_pos = world_points[i][4]
         light = place_light(mid_pos, bbox_world)
         
         file_node = cmds.shadingNode("file", asTexture=True)
@@ -81,8 +110,6 @@ def main(data_path, radius=700, divisions=100, intensity=15, exposure=11.5):
     hdr_file_node = cmds.shadingNode("file", asTexture=True)
     cmds.setAttr("{}.fileTextureName".format(hdr_file_node), hdr_path, type="string")
     cmds.connectAttr("{}.outColor".format(hdr_file_node), "{}.color".format(light_dome_shape))
-        
-    cmds.delete(sphere_name)
     
         
 data_path = "D:\\personalProjects\\maya-scripts\\extract-hdri\\"
@@ -0,0 +1,177 @@
+#! /usr/bin/env python3
+
+# Radiance RGBE (.hdr) reading and writing, a band of scanlines at a time
+# http://paulbourke.net/dataformats/pic/
+# https://www.graphics.cornell.edu/~bjw/rgbe/rgbe.c
+
+import mmap
+import re
+
+import numpy as np
+
+
+RESOLUTION_RE = re.compile(rb"^-Y (\d+) \+X (\d+)$")
+
+
+def rgbe_to_float(rgbe):
+    """Converts ...x4 RGBE bytes to ...x3 float32 BGR, the channel order cv2.imread returns"""
+    exponent = rgbe[..., 3].astype(np.int32)
+    scale = np.where(exponent > 0, np.ldexp(np.float32(1), exponent - 136), 0).astype(np.float32)
+    return rgbe[..., 2::-1] * scale[..., None]
+
+
+def float_to_rgbe(bgr):
+    """Converts ...x3 float BGR to ...x4 RGBE bytes"""
+    rgb = np.asarray(bgr, dtype=np.float32)[..., ::-1]
+    brightest = rgb.max(axis=-1)
+    mantissa, exponent = np.frexp(brightest)
+    visible = brightest > 1e-32
+    scale = np.divide(mantissa * 256, brightest, out=np.zeros_like(brightest), where=visible)
+    rgbe = np.zeros(rgb.shape[:-1] + (4,), dtype=np.uint8)
+    rgbe[..., :3] = (rgb * scale[..., None]).astype(np.uint8)
+    rgbe[..., 3] = np.where(visible, exponent + 128, 0)
+    return rgbe
+
+
+class RGBEReader:
+    """Memory maps a Radiance .hdr file and decodes it a band of scanlines at a time
+
+    Only the band being decoded is held in memory, the OS pages the file in and out as needed.
+
+    Args:
+        path (str): path to the .hdr file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = np.frombuffer(self._mmap, dtype=np.uint8)
+        self.header = {}
+        self.shape, self._start = self._read_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        # The numpy view has to be released before the map can be closed
+        self._data = None
+        self._mmap.close()
+        self._file.close()
+
+    def _read_header(self):
+        pos = 0
+        magic = True
+        while True:
+            end = self._mmap.find(b"\n", pos)
+            if end == -1:
+                raise Exception(f"{self.path} has an incomplete header")
+            line = self._mmap[pos:end].rstrip(b"\r")
+            pos = end + 1
+            if magic:
+                if not line.startswith(b"#?"):
+                    raise Exception(f"{self.path} is not a radiance file")
+                magic = False
+            elif not line:
+                break
+            elif b"=" in line:
+                key, value = line.split(b"=", 1)
+                self.header[key.decode()] = value.decode()
+
+        if self.header.get("FORMAT", "32-bit_rle_rgbe") != "32-bit_rle_rgbe":
+            raise Exception(f"Unsupported format: {self.header['FORMAT']}")
+
+        end = self._mmap.find(b"\n", pos)
+        match = RESOLUTION_RE.match(self._mmap[pos:end].strip())
+        if match is None:
+            raise Exception(f"Only standard -Y +X oriented images are supported: {self.path}")
+        rows, cols = int(match.group(1)), int(match.group(2))
+        return (rows, cols), end + 1
+
+    def _read_scanline(self, pos, out):
+        """Decodes the scanline at pos into out (Wx4), returns the position of the next scanline"""
+        mm, data = self._mmap, self._data
+        width = len(out)
+        is_rle = 8 <= width < 32768 and mm[pos] == 2 and mm[pos + 1] == 2 and not mm[pos + 2] & 0x80
+        if not is_rle:
+            if mm[pos] == 1 and mm[pos + 1] == 1 and mm[pos + 2] == 1:
+                raise Exception("Old style run length encoding is not supported")
+            out[:] = data[pos:pos + width * 4].reshape(width, 4)
+            return pos + width * 4
+
+        if (mm[pos + 2] << 8 | mm[pos + 3]) != width:
+            raise Exception(f"Scanline width doesn't match the image width in {self.path}")
+        pos += 4
+        # Each channel is run length encoded separately
+        for channel in range(4):
+            idx = 0
+            while idx < width:
+                count = mm[pos]
+                if count > 128:
+                    count -= 128
+                    out[idx:idx + count, channel] = mm[pos + 1]
+                    pos += 2
+                else:
+                    if count == 0 or idx + count > width:
+                        raise Exception(f"Bad scanline data in {self.path}")
+                    out[idx:idx + count, channel] = data[pos + 1:pos + 1 + count]
+                    pos += count + 1
+                idx += count
+        return pos
+
+    def bands(self, band_rows=256, raw=False):
+        """Yields (first row, band) for every band of scanlines from top to bottom
+
+        Bands are float32 BGR like cv2.imread returns, or the undecoded RGBE bytes if raw is set
+        """
+        rows, cols = self.shape
+        pos = self._start
+        rgbe = np.empty((band_rows, cols, 4), dtype=np.uint8)
+        for start in range(0, rows, band_rows):
+            stop = min(rows, start + band_rows)
+            for row in range(stop - start):
+                pos = self._read_scanline(pos, rgbe[row])
+            band = rgbe[:stop - start]
+            yield start, band.copy() if raw else rgbe_to_float(band)
+
+
+class RGBEWriter:
+    """Writes a Radiance .hdr file a band of scanlines at a time
+
+    Scanlines are written flat (uncompressed), which every RGBE reader supports and needs no per-pixel encoding loop.
+
+    Args:
+        path (str): path to write the .hdr file to
+        shape (int, int): rows and columns of the image
+    """
+
+    def __init__(self, path, shape):
+        self.path = path
+        self.shape = shape
+        self.rows_written = 0
+        self._file = open(path, "wb")
+        rows, cols = shape
+        self._file.write(b"#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n")
+        self._file.write(f"-Y {rows} +X {cols}\n".encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        if self.rows_written != self.shape[0]:
+            raise Exception(f"Only {self.rows_written} of {self.shape[0]} rows were written to {self.path}")
+
+    def write(self, band, raw=False):
+        """Appends a band of float BGR scanlines, or RGBE bytes if raw is set"""
+        rgbe = band if raw else float_to_rgbe(band)
+        if rgbe.shape[1:] != (self.shape[1], 4):
+            raise Exception(f"Band shape {band.shape} doesn't match the image width {self.shape[1]}")
+        self._file.write(np.ascontiguousarray(rgbe, dtype=np.uint8).tobytes())
+        self.rows_written += len(rgbe)
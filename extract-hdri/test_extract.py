@@ -0,0 +1,94 @@
+import os
+from collections import deque
+
+import cv2
+import numpy as np
+import pytest
+
+import extract
+from extract import cluster_pixels, extract_cached
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def bfs_cluster_pixels(mask, min_cluster_size=300, min_neighbor_dist=20):
+    """The deque BFS cluster_pixels used to be, with neighbors past the edges skipped instead of wrapping around"""
+    rows, cols = mask.shape
+    visited = np.zeros_like(mask)
+    clusters = []
+    for row, col in zip(*np.nonzero(mask == 1)):
+        if visited[row, col]:
+            continue
+        visited[row, col] = 1
+        queue = deque([(row, col)])
+        pixels = [(row, col)]
+        while queue:
+            row_, col_ = queue.pop()
+            for i in range(1, min_neighbor_dist + 1):
+                for d_row, d_col in ((-i, 0), (0, -i), (-i, -i), (i, 0), (0, i), (i, i), (i, -i), (-i, i)):
+                    r, c = row_ + d_row, col_ + d_col
+                    if 0 <= r < rows and 0 <= c < cols and mask[r, c] == 1 and not visited[r, c]:
+                        visited[r, c] = 1
+                        queue.append((r, c))
+                        pixels.append((r, c))
+        # The starting pixel wasn't counted towards the size
+        if len(pixels) - 1 > min_cluster_size:
+            clusters.append(sorted(pixels))
+    return clusters
+
+
+@pytest.mark.parametrize("name, min_cluster_size, min_neighbor_dist", [
+    ("mask.png", 300, 20),
+    ("smallmask.png", 5, 2),
+])
+def test_cluster_pixels_matches_bfs(name, min_cluster_size, min_neighbor_dist):
+    mask = (cv2.imread(os.path.join(HERE, name), cv2.IMREAD_GRAYSCALE) > 127).astype(np.uint8)
+    clusters = cluster_pixels(mask, min_cluster_size, min_neighbor_dist)
+    expected = bfs_cluster_pixels(mask, min_cluster_size, min_neighbor_dist)
+    assert len(clusters) == len(expected) > 0
+    for cluster, pixels in zip(clusters, expected):
+        assert list(zip(cluster.rows.tolist(), cluster.cols.tolist())) == pixels
+
+
+def test_cluster_pixels_serpentine():
+    # A single winding cluster, it's diameter is far larger than the number of union find rounds
+    mask = np.zeros((200, 200), dtype=np.uint8)
+    mask[::4] = 1
+    for i, row in enumerate(range(0, 196, 4)):
+        mask[row:row + 4, -1 if i % 2 == 0 else 0] = 1
+    clusters = cluster_pixels(mask, 10, 1)
+    assert len(clusters) == 1
+    assert len(clusters[0].rows) == mask.sum()
+
+
+def test_extract_cached_redoes_missing_or_changed_outputs(tmp_path, monkeypatch):
+    def fake_main(hdr_path, out_dir=None, **params):
+        data = {"num_lights": 1, "hdr": os.path.join(out_dir, "patched_hdr.hdr"),
+                "0": {"rect_tex": os.path.join(out_dir, "rect_tex_0.hdr")}}
+        for path in (data["hdr"], data["0"]["rect_tex"]):
+            open(path, "w").close()
+        return data
+
+    monkeypatch.setattr(extract, "main", fake_main)
+    hdr_path = tmp_path / "in.hdr"
+    hdr_path.write_bytes(b"hdr")
+    out_dir = str(tmp_path / "out")
+    assert extract_cached(str(hdr_path), out_dir, {})["status"] == "extracted"
+    assert extract_cached(str(hdr_path), out_dir, {})["status"] == "cached"
+
+    os.remove(os.path.join(out_dir, "rect_tex_0.hdr"))
+    assert extract_cached(str(hdr_path), out_dir, {})["status"] == "extracted"
+    assert extract_cached(str(hdr_path), out_dir, {"threshold": 0.5})["status"] == "extracted"
+
+    # Touching the HDR without changing it keeps the results, and records the new mtime
+    os.utime(hdr_path, ns=(0, 0))
+    assert extract_cached(str(hdr_path), out_dir, {"threshold": 0.5})["status"] == "cached"
+    get_file_hash = extract.get_file_hash
+    hashed = []
+    monkeypatch.setattr(extract, "get_file_hash", lambda path: hashed.append(path) or get_file_hash(path))
+    assert extract_cached(str(hdr_path), out_dir, {"threshold": 0.5})["status"] == "cached"
+    assert not hashed
+
+    hdr_path.write_bytes(b"HDR")
+    assert extract_cached(str(hdr_path), out_dir, {"threshold": 0.5})["status"] == "extracted"
+    assert hashed
@@ -1,8 +1,15 @@
 from __future__ import print_function, division
 
-import maya.cmds as cmds
+import numpy as np
+import math
 import re
 
+try:
+    import maya.cmds as cmds
+except ImportError:
+    # Only the array helpers work outside of maya, like the ones in utils
+    cmds = None
+
 class Component:
     def __init__(self, name, x, y, z):
         self.name = name
@@ -70,29 +77,244 @@ def point_in_curve(pt1, curve_points, max_x=999):
         return False
     return True
 
+def triangulate(face_offsets, face_vertices):
+    """Fan triangulates faces stored as offsets into a flat vertex list, returns a Tx3 array of vertex ids"""
+    counts = np.diff(face_offsets)
+    num_tris = np.maximum(counts - 2, 0)
+    firsts = np.repeat(face_offsets[:-1], num_tris)
+    # Position of each triangle within it's face's fan
+    fan = np.arange(num_tris.sum()) - np.repeat(np.cumsum(num_tris) - num_tris, num_tris)
+    return np.stack([face_vertices[firsts], face_vertices[firsts + fan + 1], face_vertices[firsts + fan + 2]], axis=1)
+
+
+def slice_mesh(points, face_offsets, face_vertices, y_val):
+    """Slices a mesh with the plane at a given height, without editing the scene
+
+    Args:
+        points (float[][]): Vx3 vertex positions
+        face_offsets (int[]): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (int[]): flat vertex ids of every face
+        y_val (float): height to slice at
+
+    Returns:
+        list of Nx3 arrays, one for each separate loop (or open chain for meshes with borders)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    tris = triangulate(np.asarray(face_offsets), np.asarray(face_vertices))
+    above = points[:, 1] > y_val
+    tri_above = above[tris]
+    tris = tris[tri_above.any(axis=1) & ~tri_above.all(axis=1)]
+    if not len(tris):
+        return []
+
+    # Walking each triangle's edges in winding order, the plane is crossed once going down and once going up
+    starts = tris
+    ends = np.roll(tris, -1, axis=1)
+    going_down = above[starts] & ~above[ends]
+    going_up = ~above[starts] & above[ends]
+    rows = np.arange(len(tris))
+    down_edge = np.sort(np.stack([starts[rows, going_down.argmax(axis=1)], ends[rows, going_down.argmax(axis=1)]], axis=1), axis=1)
+    up_edge = np.sort(np.stack([starts[rows, going_up.argmax(axis=1)], ends[rows, going_up.argmax(axis=1)]], axis=1), axis=1)
+
+    # Every crossed mesh edge becomes one contour point, shared by the triangles on either side of it
+    edges, inverse = np.unique(np.concatenate([up_edge, down_edge]), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    a, b = points[edges[:, 0]], points[edges[:, 1]]
+    t = (y_val - a[:, 1]) / (b[:, 1] - a[:, 1])
+    contour_points = a + (b - a) * t[:, None]
+    contour_points[:, 1] = y_val
+
+    # With consistent winding each triangle's segment runs from the edge it goes up over to the one it goes down over
+    next_point = np.full(len(edges), -1, dtype=np.int64)
+    next_point[inverse[:len(tris)]] = inverse[len(tris):]
+    has_previous = np.zeros(len(edges), dtype=bool)
+    has_previous[next_point[next_point >= 0]] = True
+
+    loops = []
+    visited = np.zeros(len(edges), dtype=bool)
+    # Open chains have to be walked from their start, anything left over is a closed loop
+    for start in list(np.flatnonzero(~has_previous)) + list(range(len(edges))):
+        if visited[start]:
+            continue
+        loop = []
+        idx = start
+        while idx != -1 and not visited[idx]:
+            visited[idx] = True
+            loop.append(idx)
+            idx = next_point[idx]
+        loops.append(contour_points[loop])
+    return loops
+
+
+def get_underside(points, face_offsets, face_vertices, samples):
+    """Samples the lowest height of a mesh straight above or below each XZ sample point
+
+    Samples are binned into a grid, and each triangle only tests the samples in the cells it's bounding box covers.
+
+    Args:
+        points (float[][]): Vx3 vertex positions
+        face_offsets (int[]): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (int[]): flat vertex ids of every face
+        samples (float[][]): Nx2 (x, z) points to sample at
+
+    Returns:
+        np.ndarray: N heights, nan where the mesh doesn't cover a sample
+    """
+    points = np.asarray(points, dtype=np.float64)
+    samples = np.asarray(samples, dtype=np.float64).reshape(-1, 2)
+    heights = np.full(len(samples), np.inf)
+    tris = triangulate(np.asarray(face_offsets), np.asarray(face_vertices))
+    if not len(tris) or not len(samples):
+        return np.full(len(samples), np.nan)
+    xz, y = points[:, [0, 2]], points[:, 1]
+
+    # Aiming for a few samples per cell
+    lo = samples.min(axis=0)
+    span = np.maximum(samples.max(axis=0) - lo, 1e-9)
+    cell_size = max(math.sqrt(span[0] * span[1] * 4 / len(samples)), span.max() / 4096)
+    grid_shape = (span // cell_size).astype(np.int64) + 1
+    sample_cells = ((samples - lo) // cell_size).astype(np.int64)
+    sample_keys = sample_cells[:, 0] * grid_shape[1] + sample_cells[:, 1]
+    order = np.argsort(sample_keys, kind="stable")
+    cell_offsets = np.searchsorted(sample_keys[order], np.arange(grid_shape.prod() + 1))
+
+    tri_lo = np.clip(((xz[tris].min(axis=1) - lo) // cell_size).astype(np.int64), 0, grid_shape - 1)
+    tri_hi = np.clip(((xz[tris].max(axis=1) - lo) // cell_size).astype(np.int64), 0, grid_shape - 1)
+    outside = np.any((xz[tris].max(axis=1) < lo) | (xz[tris].min(axis=1) > lo + span), axis=1)
+    tris, tri_lo, tri_hi = tris[~outside], tri_lo[~outside], tri_hi[~outside]
+
+    # Going through the triangles in chunks to keep the expanded triangle/sample pairs bounded
+    chunk = 10000
+    for i in range(0, len(tris), chunk):
+        c_tris, c_lo, c_hi = tris[i:i + chunk], tri_lo[i:i + chunk], tri_hi[i:i + chunk]
+        cols = c_hi[:, 1] - c_lo[:, 1] + 1
+        num_cells = (c_hi[:, 0] - c_lo[:, 0] + 1) * cols
+        tri_ids = np.repeat(np.arange(len(c_tris)), num_cells)
+        local = np.arange(num_cells.sum()) - np.repeat(np.cumsum(num_cells) - num_cells, num_cells)
+        cells = (c_lo[tri_ids, 0] + local // cols[tri_ids]) * grid_shape[1] + c_lo[tri_ids, 1] + local % cols[tri_ids]
+
+        counts = cell_offsets[cells + 1] - cell_offsets[cells]
+        pair_tris = np.repeat(tri_ids, counts)
+        starts = np.repeat(cell_offsets[cells] - np.cumsum(counts) + counts, counts)
+        pair_samples = order[starts + np.arange(counts.sum())]
+
+        # Barycentric coordinates of each sample in the triangle's XZ projection
+        a, b, c = [xz[c_tris[pair_tris, k]] for k in range(3)]
+        p = samples[pair_samples]
+        area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w_b = ((p[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (p[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])) / area
+            w_c = ((b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0])) / area
+        w_a = 1 - w_b - w_c
+        eps = -1e-9
+        hit = (area != 0) & (w_a >= eps) & (w_b >= eps) & (w_c >= eps)
+        tri_y = y[c_tris[pair_tris[hit]]]
+        sample_y = w_a[hit] * tri_y[:, 0] + w_b[hit] * tri_y[:, 1] + w_c[hit] * tri_y[:, 2]
+        np.minimum.at(heights, pair_samples[hit], sample_y)
+
+    heights[np.isinf(heights)] = np.nan
+    return heights
+
+
+def points_in_loops(points, loops, num_bands=None):
+    """Tests which points are inside a set of closed loops on the XZ plane
+
+    Uses the crossing number of a ray towards +X, so loops inside other loops act as holes.
+    Edges are binned into horizontal bands so each point is only tested against the edges at it's height.
+
+    Args:
+        points (float[][]): Nx2 (x, z) points to test
+        loops (float[][][]): list of Mx2 (x, z) loop points, the last point connects back to the first
+        num_bands (int): number of bands to bin the edges into, defaults to one per 16 edges up to 4096
+
+    Returns:
+        np.ndarray: N bools, True for points inside
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    loops = [np.asarray(loop, dtype=np.float64).reshape(-1, 2) for loop in loops]
+    inside = np.zeros(len(points), dtype=bool)
+    starts = np.concatenate([loop for loop in loops if len(loop)] or [np.zeros((0, 2))])
+    if not len(starts) or not len(points):
+        return inside
+    ends = np.concatenate([np.roll(loop, -1, axis=0) for loop in loops if len(loop)])
+
+    # Only points inside the bounding box of the loops can be inside them, every vertex counts towards it
+    # including the ones that only start horizontal edges
+    lo, hi = starts.min(axis=0), starts.max(axis=0)
+
+    # Horizontal edges can never be crossed by the ray
+    sloped = starts[:, 1] != ends[:, 1]
+    starts, ends = starts[sloped], ends[sloped]
+    if not len(starts):
+        return inside
+    candidates = np.flatnonzero(np.all((points >= lo) & (points <= hi), axis=1))
+
+    num_bands = num_bands or min(4096, max(1, len(starts) // 16))
+    band_height = (hi[1] - lo[1]) / num_bands
+    def get_band(z):
+        return np.clip(((z - lo[1]) / band_height).astype(np.int64), 0, num_bands - 1)
+
+    # Listing every edge under each band it spans
+    first = get_band(np.minimum(starts[:, 1], ends[:, 1]))
+    last = get_band(np.maximum(starts[:, 1], ends[:, 1]))
+    spans = last - first + 1
+    edge_ids = np.repeat(np.arange(len(starts)), spans)
+    edge_bands = np.repeat(first, spans) + np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    order = np.argsort(edge_bands, kind="stable")
+    edge_ids = edge_ids[order]
+    band_offsets = np.searchsorted(edge_bands[order], np.arange(num_bands + 1))
+
+    point_bands = get_band(points[candidates, 1])
+    order = np.argsort(point_bands, kind="stable")
+    candidates, point_bands = candidates[order], point_bands[order]
+    point_offsets = np.searchsorted(point_bands, np.arange(num_bands + 1))
+
+    for band in range(num_bands):
+        band_points = candidates[point_offsets[band]:point_offsets[band + 1]]
+        band_edges = edge_ids[band_offsets[band]:band_offsets[band + 1]]
+        if not len(band_points) or not len(band_edges):
+            continue
+        x1, z1 = starts[band_edges, 0], starts[band_edges, 1]
+        x2, z2 = ends[band_edges, 0], ends[band_edges, 1]
+        # Keeping each block of the point/edge matrix at a reasonable size
+        chunk = max(1, 10 ** 6 // len(band_edges))
+        for i in range(0, len(band_points), chunk):
+            ids = band_points[i:i + chunk]
+            px, pz = points[ids, 0, None], points[ids, 1, None]
+            straddles = (z1 > pz) != (z2 > pz)
+            crossing_x = x1 + (pz - z1) * (x2 - x1) / (z2 - z1)
+            crossings = straddles & (px < crossing_x)
+            inside[ids] = np.bitwise_xor.reduce(crossings, axis=1)
+    return inside
+
+
 # For now, ground plane must start at y=0
 def get_intersection(ground, obj):
-    intersection_points = []
-    edge_name = cut_at_y(obj, 0)
-    curve_points = edge_loop_to_curve(edge_name, delete_edges=True)
-    for face_id in range(cmds.polyEvaluate(ground, f=True)):
-        face_name = "{}.f[{}]".format(ground, face_id)
-        pos = get_position(face_name)
-        face = Component(face_name, *pos)
-        if point_in_curve(face, curve_points):
-            intersection_points.append(face.name)
-    return intersection_points
-
-
-def imprint(ground, obj, step_distance=1):
+    obj_snapshot = MeshSnapshot(obj)
+    loops = slice_mesh(obj_snapshot.points, obj_snapshot.face_offsets, obj_snapshot.face_vertices, 0)
+    snapshot = MeshSnapshot(ground)
+    inside = points_in_loops(snapshot.face_centroids[:, [0, 2]], [loop[:, [0, 2]] for loop in loops])
+    return ["{}.f[{}]".format(ground, face_id) for face_id in np.flatnonzero(inside)]
+
+
+def imprint(ground, obj, step_distance=1, single_sweep=False):
+    """Sinks obj into the ground and pushes the ground faces it passes through down with it
+
+    With single_sweep the object is moved to it's final depth at once, and every ground face is pushed
+    down to the object's underside in one bulk write instead of recomputing the intersection every step
+    """
     obj_start_pos = get_position(obj)
     _, bbox_y, _ = cmds.polyEvaluate([obj], b=True)
     cmds.move(0, bbox_y[0], 0, "{}.scalePivot".format(obj), "{}.rotatePivot".format(obj), r=True, a=True)
     cmds.move(0, 0, 0, [obj], a=True, ws=True, rpr=True)
     obj_new_pos = get_position(obj)
     num_steps = abs(int((obj_start_pos[1] - obj_new_pos[1]) // step_distance))
+    if single_sweep:
+        cmds.move(0, -step_distance * num_steps, 0, [obj], r=True, os=True, wd=True)
+        imprint_underside(ground, obj)
+        return
     for i in range(num_steps):
-        cmds.move(0, -1, 0, [obj], r=True, os=True, wd=True)
+        cmds.move(0, -step_distance, 0, [obj], r=True, os=True, wd=True)
         intersection_points = get_intersection(ground, obj)
         _, bbox_ground_y, _ = cmds.polyEvaluate(ground, b=True)
         _, bbox_obj_y, _ = cmds.polyEvaluate(obj, b=True)
@@ -100,6 +322,24 @@ def imprint(ground, obj, step_distance=1):
         cmds.select(*intersection_points)
         cmds.polyMoveFacet(ty=diff)
 
-ground = "pPlane1"
-obj = "pSphere1"
-imprint(ground, obj)
\ No newline at end of file
+
+def imprint_underside(ground, obj):
+    """Pushes every ground face that's above the underside of obj down onto it, in one write"""
+    obj_snapshot = MeshSnapshot(obj)
+    snapshot = MeshSnapshot(ground)
+    underside = get_underside(obj_snapshot.points, obj_snapshot.face_offsets, obj_snapshot.face_vertices,
+                              snapshot.face_centroids[:, [0, 2]])
+    face_y = snapshot.face_centroids[:, 1]
+    depth = np.where(underside < face_y, underside - face_y, 0)
+
+    # Vertices shared between faces follow the deepest one
+    offsets = np.zeros(snapshot.num_verts)
+    np.minimum.at(offsets, snapshot.face_vertices, np.repeat(depth, np.diff(snapshot.face_offsets)))
+    points = snapshot.points.copy()
+    points[:, 1] += offsets
+    set_points(ground, points)
+
+if __name__ == "__main__":
+    ground = "pPlane1"
+    obj = "pSphere1"
+    imprint(ground, obj)
\ No newline at end of file
@@ -0,0 +1,27 @@
+import numpy as np
+
+from intersect import Component, point_in_curve, points_in_loops
+
+
+def to_components(loop):
+    return [Component(None, x, 0, z) for x, z in loop]
+
+
+def test_horizontal_bottom_edge():
+    # The bottom corners only start horizontal edges, the bounding box still has to reach them
+    triangle = np.array([(0, 0), (10, 0), (5, 5)], dtype=np.float64)
+    assert points_in_loops([(2, 0.5)], [triangle])[0]
+    assert point_in_curve(Component(None, 2, 0, 0.5), to_components(triangle))
+
+
+def test_matches_point_in_curve():
+    loops = [
+        np.array([(0, 0), (10, 0), (5, 5)], dtype=np.float64),
+        np.array([(20, 0), (30, 0), (30, 1), (25, 1), (25, 6), (20, 6)], dtype=np.float64),
+    ]
+    points = np.random.default_rng(0).uniform(-2, 32, (2000, 2))
+    expected = np.zeros(len(points), dtype=bool)
+    for loop in loops:
+        curve = to_components(loop)
+        expected ^= [point_in_curve(Component(None, x, 0, z), curve) for x, z in points]
+    assert np.array_equal(points_in_loops(points, loops), expected)
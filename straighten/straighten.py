@@ -1,68 +1,80 @@
 from __future__ import print_function, division
 
 import maya.cmds as cmds
-import string
+import numpy as np
 
-def line_intersection(a1, a2, b1, b2):
-    line1 = (a1, a2)
-    line2 = (b1, b2)
-    xdiff = (line1[0][0] - line1[1][0], line2[0][0] - line2[1][0])
-    ydiff = (line1[0][1] - line1[1][1], line2[0][1] - line2[1][1])
+def get_ring_path(topology, edge1, edge2):
+    """Returns the edge ids along the ring from edge1 to edge2 like polySelect(erp=...), the shorter way round a closed ring"""
+    ring = topology.edge_ring(edge1).tolist()
+    if edge2 not in ring:
+        raise Exception("Edges {} and {} are not on the same edge ring".format(edge1, edge2))
+    start, end = sorted((ring.index(edge1), ring.index(edge2)))
+    path = ring[start:end + 1]
+    closed = len(ring) > 2 and np.isin(topology.edge_face_ids(ring[0]), topology.edge_face_ids(ring[-1])).any()
+    if closed and len(ring) - len(path) + 2 < len(path):
+        path = ring[end:] + ring[:start + 1]
+    return path
 
-    def det(a, b):
-        return a[0] * b[1] - a[1] * b[0]
 
-    div = det(xdiff, ydiff)
-    if div == 0:
-       raise Exception('lines do not intersect')
+def straighten_edge_pairs(obj_name, edge_pairs, move_axis, other_axis, snapshot=None):
+    """Straightens the vertices between every pair of edges in one pass
 
-    d = (det(*line1), det(*line2))
-    x = det(d, xdiff) / div
-    y = det(d, ydiff) / div
-    return x, y
+    Each pair makes a line through it's edge centers, every vertex on the edge ring between them is moved along
+    move_axis onto that line. Positions are read once and written back in a single call, so every pair is solved
+    from the original positions.
 
+    Args:
+        obj_name (str): mesh the edges belong to
+        edge_pairs (int[][]): Nx2 edge ids, both edges of a pair have to be on the same edge ring
+        move_axis (int): axis vertices are moved along
+        other_axis (int): axis the lines run along
+        snapshot (MeshSnapshot): object space snapshot of obj_name, taken if not given
 
-def straighten_edges(move_axis, other_axis, max_y=999):
-    idx2, idx1 = move_axis, other_axis
-    edge1, edge2 = unpack_selection_items(cmds.ls(selection=True))
-    edge1_pos = get_position(edge1, object_space=True)
-    edge2_pos = get_position(edge2, object_space=True)
-    a1 = (edge1_pos[idx1], edge1_pos[idx2])
-    a2 = (edge2_pos[idx1], edge2_pos[idx2])
+    Returns:
+        np.ndarray: new object space positions of every vertex
+    """
+    if snapshot is None:
+        snapshot = MeshSnapshot(obj_name, object_space=True)
+    topology = snapshot.topology
+    edge_pairs = np.asarray(edge_pairs, dtype=np.int64).reshape(-1, 2)
 
-    # Getting all verts inbetween the two edges
-    obj_name = edge1.split(".")[0]
-    edge1_id = int("".join([i for i in edge1.split(".")[1] if i in string.digits]))
-    edge2_id = int("".join([i for i in edge2.split(".")[1] if i in string.digits]))
-    cmds.polySelect(obj_name, erp=[edge1_id, edge2_id], r=True)
-    edges = unpack_selection_items(cmds.ls(selection=True))
-    verts_packed = cmds.polyListComponentConversion(edges, fe=True, tv=True)
-    verts = unpack_selection_items(verts_packed)
+    # Getting all verts inbetween every pair of edges, along with the pair they belong to
+    verts, pair_ids = [], []
+    for i, (edge1, edge2) in enumerate(edge_pairs.tolist()):
+        path_verts = np.unique(topology.edges[get_ring_path(topology, edge1, edge2)])
+        verts.append(path_verts)
+        pair_ids.append(np.full(len(path_verts), i))
+    verts, pair_ids = np.concatenate(verts), np.concatenate(pair_ids)
 
-    for vert in verts:
-        pos = get_position(vert, object_space=True)
-        b1 = (pos[idx1], pos[idx2])
-        b2 = (pos[idx1], max_y)
-        _, y = line_intersection(a1, a2, b1, b2)
-        cmds.select(vert)
-        if idx2 == 0:
-            cmds.move(y, x=True, os=True)
-        elif idx2 == 1:
-            cmds.move(y, y=True, os=True)
-        elif idx2 == 2:
-            cmds.move(y, z=True, os=True)  
+    centers = snapshot.points[topology.edges[edge_pairs]].mean(axis=2)
+    a1, a2 = centers[:, 0], centers[:, 1]
+    run = a2[:, other_axis] - a1[:, other_axis]
+    if (run == 0).any():
+        raise Exception("lines do not intersect")
+    slopes = (a2[:, move_axis] - a1[:, move_axis]) / run
+
+    # Verts shared by neighbouring pairs end up on the line of the last pair
+    points = snapshot.points.copy()
+    points[verts, move_axis] = a1[pair_ids, move_axis] + slopes[pair_ids] * (points[verts, other_axis] - a1[pair_ids, other_axis])
+    set_points(obj_name, points, object_space=True)
+    return points
+
+
+def straighten_edges(move_axis, other_axis):
+    selection = ComponentSelection.from_names(cmds.ls(selection=True))[0]
+    straighten_edge_pairs(selection.obj_name, [selection.ids], move_axis, other_axis)
 
 def straighten_multiple_edges(edge_loop_1, edge_loop_2, move_axis, other_axis):
-    # This is so stupid but it works
-    all_axis = [0,1,2]
-    all_axis.remove(move_axis)
-    all_axis.remove(other_axis)
-    sort_axis = all_axis[0]
-    edge_loop_1 = sorted(edge_loop_1, key=lambda x: get_position(x, object_space=True)[sort_axis])
-    edge_loop_2 = sorted(edge_loop_2, key=lambda x: get_position(x, object_space=True)[sort_axis])
-    for edge1, edge2 in zip(edge_loop_1, edge_loop_2):
-        cmds.select(edge1, edge2, r=True)
-        straighten_edges(move_axis, other_axis)
+    loop_1 = ComponentSelection.from_names(edge_loop_1)[0]
+    loop_2 = ComponentSelection.from_names(edge_loop_2)[0]
+    snapshot = MeshSnapshot(loop_1.obj_name, object_space=True)
+    # Pairing the edges of both loops up by their position on the remaining axis
+    sort_axis = 3 - move_axis - other_axis
+    edges_1 = loop_1.ids[np.argsort(snapshot.component_positions("e", loop_1.ids)[:, sort_axis], kind="stable")]
+    edges_2 = loop_2.ids[np.argsort(snapshot.component_positions("e", loop_2.ids)[:, sort_axis], kind="stable")]
+    num_pairs = min(len(edges_1), len(edges_2))
+    edge_pairs = np.stack([edges_1[:num_pairs], edges_2[:num_pairs]], axis=1)
+    straighten_edge_pairs(loop_1.obj_name, edge_pairs, move_axis, other_axis, snapshot=snapshot)
         
 x = 0
 y = 1
@@ -0,0 +1,220 @@
+import numpy as np
+import pytest
+
+import utils
+from utils import (COMPONENT_RE, MeshSnapshot, MeshTopology, format_polyinfo, get_face_vector_areas, get_position,
+                   normalize, parse_polyinfo, read_obj, write_obj)
+
+
+def test_parse_polyinfo_blank_lines():
+    # Blank lines used to leave line end sentinels back to back, which turned into extra values
+    lines = ["FACE      0:      0      1      2 \n", "\n", "\n", "FACE      1:      2      1      3      4 \n", ""]
+    ids, offsets, values = parse_polyinfo(lines)
+    assert ids.tolist() == [0, 1]
+    assert offsets.tolist() == [0, 3, 7]
+    assert values.tolist() == [0, 1, 2, 2, 1, 3, 4]
+    assert values.dtype == np.int64
+
+
+def test_parse_polyinfo_empty():
+    for lines in ([], [""], ["\n", "\n"], None):
+        ids, offsets, values = parse_polyinfo(lines, flt=True)
+        assert len(ids) == len(values) == 0
+        assert offsets.tolist() == [0]
+
+
+def test_parse_polyinfo_labels():
+    normals = ["FACE_NORMAL      0: 0.000000 1.000000 -2.5e-01\n", "FACE_NORMAL      1: 1 0 0\n"]
+    assert format_polyinfo(normals) == [[0.0, 1.0, -0.25], [1.0, 0.0, 0.0]]
+    edges = ["EDGE      0:      0      1  Hard\n", "EDGE      1:      1      2  Soft\n"]
+    ids, offsets, values = parse_polyinfo(edges)
+    assert ids.tolist() == [0, 1]
+    assert values.tolist() == [0, 1, 1, 2]
+
+
+class FakeCmds(object):
+    """Just enough of maya.cmds (xform and polyInfo fv/fn/ev) to snapshot meshes that only exist as arrays
+
+    Matrices are row major with the translation in the last row, like xform returns them
+    """
+
+    def __init__(self):
+        self.meshes = {}
+
+    def add_mesh(self, name, points, face_offsets, face_vertices, matrix=None):
+        matrix = np.eye(4) if matrix is None else np.asarray(matrix, dtype=np.float64).reshape(4, 4)
+        topology = MeshTopology(len(points), face_offsets, face_vertices)
+        self.meshes[name] = (np.asarray(points, dtype=np.float64), topology, matrix)
+
+    def select(self, *args, **kwargs):
+        pass
+
+    def _points(self, name, world):
+        points, _, matrix = self.meshes[name]
+        return points.dot(matrix[:3, :3]) + matrix[3, :3] if world else points
+
+    def xform(self, name, q=False, translation=False, matrix=False, os=False, ws=False, worldSpace=False):
+        obj_name, _, component = name.partition(".")
+        _, topology, obj_matrix = self.meshes[obj_name]
+        if matrix:
+            return obj_matrix.ravel().tolist()
+        if not component:
+            return obj_matrix[3, :3].tolist()
+        match = COMPONENT_RE.match(name)
+        kind, ids = match.group("kind"), match.group("ids")
+        count = {"vtx": topology.num_verts, "f": topology.num_faces, "e": topology.num_edges}[kind]
+        start, _, end = ids.partition(":")
+        ids = np.arange(count) if ids == "*" else np.arange(int(start), int(end or start) + 1)
+        if kind == "vtx":
+            verts = ids
+        elif kind == "f":
+            verts = np.unique(np.concatenate([topology.face_vertex_ids(i) for i in ids]))
+        else:
+            verts = np.unique(topology.edges[ids])
+        return self._points(obj_name, not os)[verts].ravel().tolist()
+
+    def polyInfo(self, name, fv=False, fn=False, ev=False):
+        points, topology, _ = self.meshes[name]
+        if fv:
+            return ["FACE {:6d}: {} \n".format(i, " ".join("{:6d}".format(v) for v in topology.face_vertex_ids(i)))
+                    for i in range(topology.num_faces)]
+        if fn:
+            normals = normalize(get_face_vector_areas(points, topology.face_offsets, topology.face_vertices))
+            return ["FACE_NORMAL {:6d}: {:f} {:f} {:f}\n".format(i, *n) for i, n in enumerate(normals)]
+        if ev:
+            return ["EDGE {:6d}: {:6d} {:6d}  Hard\n".format(i, a, b) for i, (a, b) in enumerate(topology.edges)]
+        raise Exception("Unsupported polyInfo flags")
+
+
+def box():
+    """A 2x2x2 cube around the origin with it's faces pointing out"""
+    points = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+    faces = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+    return points, np.arange(0, 25, 4), np.array(faces).ravel()
+
+
+# Rotated around Y and Z, stretched along X and moved, so normals need the inverse transpose
+ANGLE = np.radians(30)
+MATRIX = np.diag([3.0, 1.0, 0.5, 1.0])
+MATRIX[:3, :3] = MATRIX[:3, :3].dot([[np.cos(ANGLE), 0, -np.sin(ANGLE)], [0, 1, 0], [np.sin(ANGLE), 0, np.cos(ANGLE)]])
+MATRIX[:3, :3] = MATRIX[:3, :3].dot([[np.cos(ANGLE), np.sin(ANGLE), 0], [-np.sin(ANGLE), np.cos(ANGLE), 0], [0, 0, 1]])
+MATRIX[3, :3] = [1, 2, 3]
+
+
+@pytest.fixture
+def fake_cmds(monkeypatch):
+    backend = FakeCmds()
+    backend.add_mesh("pCube1", *box(), matrix=MATRIX)
+    # get_position without a snapshot goes through utils.cmds
+    monkeypatch.setattr(utils, "cmds", backend)
+    return backend
+
+
+@pytest.mark.parametrize("object_space", [False, True])
+def test_snapshot_points_and_centroids(fake_cmds, object_space):
+    points, face_offsets, face_vertices = box()
+    if not object_space:
+        points = points.dot(MATRIX[:3, :3]) + MATRIX[3, :3]
+    snapshot = MeshSnapshot("pCube1", object_space=object_space, backend=fake_cmds)
+    assert np.allclose(snapshot.points, points)
+    assert np.array_equal(snapshot.face_offsets, face_offsets)
+    assert np.array_equal(snapshot.face_vertices, face_vertices)
+    centroids = [points[face_vertices[start:end]].mean(axis=0) for start, end in zip(face_offsets[:-1], face_offsets[1:])]
+    assert np.allclose(snapshot.face_centroids, centroids)
+    assert np.array_equal(snapshot.edge_vertices, MeshTopology(8, face_offsets, face_vertices).edges)
+
+
+def test_snapshot_world_normals(fake_cmds):
+    snapshot = MeshSnapshot("pCube1", backend=fake_cmds)
+    # Every face of the cube is flat, so the normal of it's first three world space corners is the face normal
+    corners = snapshot.points[snapshot.face_vertices.reshape(-1, 4)]
+    expected = normalize(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]))
+    assert np.allclose(snapshot.face_normals, expected, atol=1e-5)
+    assert np.allclose(np.linalg.norm(snapshot.face_normals, axis=1), 1)
+
+
+@pytest.mark.parametrize("object_space", [False, True])
+def test_get_position_snapshot_matches_xform(fake_cmds, object_space):
+    snapshot = MeshSnapshot("pCube1", object_space=object_space, backend=fake_cmds)
+    for name in ["pCube1", "pCube1.vtx[3]", "pCube1.vtx[2:5]", "pCube1.vtx[*]", "pCube1.f[1]", "pCube1.f[0:2]", "pCube1.e[4]"]:
+        # Without a snapshot every vertex xform returns is averaged one by one
+        expected = get_position(name, object_space=object_space)
+        assert np.allclose(get_position(name, object_space=object_space, snapshot=snapshot), expected)
+    with pytest.raises(Exception, match="requested space"):
+        get_position("pCube1.f[0]", object_space=not object_space, snapshot=snapshot)
+
+
+def edge_id(topology, a, b):
+    return int(np.flatnonzero((topology.edges.min(axis=1) == min(a, b)) & (topology.edges.max(axis=1) == max(a, b)))[0])
+
+
+def edge_pairs(topology, edge_ids):
+    return [tuple(sorted(i)) for i in topology.edges[edge_ids].tolist()]
+
+
+@pytest.fixture
+def grid_topology(tmp_path):
+    # 4x4 vertices, 3x3 quads, written with vt/vn indices like maya exports them
+    lines = ["v {} 0 {}\n".format(i % 4, i // 4) for i in range(16)] + ["vt 0 0\n", "vn 0 1 0\n"]
+    for row in range(3):
+        for col in range(3):
+            ids = [row * 4 + col, (row + 1) * 4 + col, (row + 1) * 4 + col + 1, row * 4 + col + 1]
+            lines.append("f {}\n".format(" ".join("{}/1/1".format(i + 1) for i in ids)))
+    path = tmp_path / "grid.obj"
+    path.write_text("".join(lines))
+    points, face_offsets, face_vertices = read_obj(str(path))
+    assert points.shape == (16, 3) and len(face_offsets) == 10
+    return MeshTopology(len(points), face_offsets, face_vertices)
+
+
+@pytest.fixture
+def torus_topology(tmp_path):
+    # 6 rings of 4 vertices, closed all the way around
+    u, v = np.meshgrid(np.arange(6), np.arange(4), indexing="ij")
+    theta, phi = 2 * np.pi * u.ravel() / 6, 2 * np.pi * v.ravel() / 4
+    points = np.stack([(2 + np.cos(phi)) * np.cos(theta), np.sin(phi), (2 + np.cos(phi)) * np.sin(theta)], axis=1)
+    faces = [[a * 4 + b, a * 4 + (b + 1) % 4, (a + 1) % 6 * 4 + (b + 1) % 4, (a + 1) % 6 * 4 + b] for a in range(6) for b in range(4)]
+    path = str(tmp_path / "torus.obj")
+    write_obj(path, points, np.arange(0, 97, 4), np.array(faces).ravel())
+    points, face_offsets, face_vertices = read_obj(path)
+    return MeshTopology(len(points), face_offsets, face_vertices)
+
+
+def test_grid_border_loops(grid_topology):
+    loops = grid_topology.border_loops()
+    assert len(loops) == 1
+    assert sorted(loops[0]) == [0, 1, 2, 3, 4, 7, 8, 11, 12, 13, 14, 15]
+    # Borders follow the winding of the faces they belong to
+    half_edges = set(zip(grid_topology.face_vertices.tolist(), grid_topology.face_vertices[grid_topology.half_edge_next].tolist()))
+    assert all((a, b) in half_edges for a, b in zip(loops[0], loops[0][1:] + loops[0][:1]))
+
+
+def test_grid_vertex_neighbourhoods(grid_topology):
+    faces, border_verts = grid_topology.vertex_neighbourhoods([0, 5, 7])
+    assert [i.tolist() for i in faces] == [[0], [0, 1, 3, 4], [2, 5]]
+    assert [i.tolist() for i in border_verts] == [[1, 4, 5], [0, 1, 2, 4, 6, 8, 9, 10], [2, 3, 6, 10, 11]]
+
+
+def test_grid_edge_loop_and_ring(grid_topology):
+    loop = grid_topology.edge_loop(edge_id(grid_topology, 5, 6))
+    assert edge_pairs(grid_topology, loop) == [(4, 5), (5, 6), (6, 7)]
+    ring = grid_topology.edge_ring(edge_id(grid_topology, 5, 6))
+    assert edge_pairs(grid_topology, ring) == [(1, 2), (5, 6), (9, 10), (13, 14)]
+    # Loops along the border carry on through the border vertices with three edges
+    border = grid_topology.edge_loop(edge_id(grid_topology, 0, 1))
+    assert edge_pairs(grid_topology, border) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_torus_topology(torus_topology):
+    assert torus_topology.border_loops() == []
+    assert not len(torus_topology.border_edges)
+    assert (torus_topology.valences == 4).all()
+
+    loop = torus_topology.edge_loop(edge_id(torus_topology, 0, 1))
+    assert sorted(edge_pairs(torus_topology, loop)) == [(0, 1), (0, 3), (1, 2), (2, 3)]
+    ring = torus_topology.edge_ring(edge_id(torus_topology, 0, 1))
+    assert sorted(edge_pairs(torus_topology, ring)) == [(a * 4, a * 4 + 1) for a in range(6)]
+
+    faces, border_verts = torus_topology.vertex_neighbourhoods(np.arange(24))
+    assert all(len(i) == 4 for i in faces)
+    assert all(len(i) == 8 for i in border_verts)
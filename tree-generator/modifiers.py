@@ -1,4 +1,5 @@
 import maya.cmds as cmds
+import numpy as np
 import random
 
 def random_bend(thresh=20):
@@ -15,10 +16,16 @@ def random_flare(curve_range=(-0.5, 0)):
         startFlareX=f_v[0],
         endFlareX=f_v[1])
 
-def randomize_faces(obj_name=None, move_thresh=0.1, rotate_thresh=1, move_bias=None, rotate_bias=None, component_space=False):
+def randomize_faces(obj_name=None, move_thresh=0.1, rotate_thresh=1, move_bias=None, rotate_bias=None, component_space=False, seed=None, bulk=False):
     
     if obj_name is None:
         obj_name = cmds.ls(selection=True)[0]
+
+    if bulk:
+        randomize_faces_bulk(obj_name, move_thresh, rotate_thresh, move_bias, rotate_bias, component_space, seed)
+        return
+
+    rand = random.Random(seed)
     
     # Loop through all faces and randomly manipulate
     num_faces = cmds.polyEvaluate(obj_name, f=True)
@@ -26,8 +33,8 @@ def randomize_faces(obj_name=None, move_thresh=0.1, rotate_thresh=1, move_bias=N
         cmds.select("{}.f[{}]".format(obj_name, num))
         normal = format_polyinfo(cmds.polyInfo(fn=True))
         if normal[1] not in (-1, 1): # Not manipulating straight faces
-           rotate_coords = [random.uniform(-rotate_thresh, rotate_thresh) for i in range(3)]
-           move_coords = [random.uniform(-move_thresh, move_thresh) for i in range(3)]
+           rotate_coords = [rand.uniform(-rotate_thresh, rotate_thresh) for i in range(3)]
+           move_coords = [rand.uniform(-move_thresh, move_thresh) for i in range(3)]
            if rotate_bias:
                rotate_coords = [c * b for c, b in zip(rotate_coords, rotate_bias)]
            if move_bias:
@@ -42,3 +49,31 @@ def randomize_faces(obj_name=None, move_thresh=0.1, rotate_thresh=1, move_bias=N
     # Harden edges
     cmds.select(obj_name, r=True)
     cmds.polySoftEdge(angle=0)
+
+def randomize_faces_bulk(obj_name, move_thresh=0.1, rotate_thresh=1, move_bias=None, rotate_bias=None, component_space=False, seed=None):
+    """Randomly rotates and moves every face of an object with one snapshot and one point write
+
+    Faces are transformed by randomize_face_points, the same seed always gives the same result.
+
+    Args:
+        obj_name (str): name of the object to randomize
+        move_thresh (float): maximum distance to move each face along each axis
+        rotate_thresh (float): maximum degrees to rotate each face around each axis
+        move_bias (float[]): per axis multipliers for the move
+        rotate_bias (float[]): per axis multipliers for the rotation
+        component_space (bool): move and rotate each face along it's own normal instead of the world axes
+        seed (int): seed for the random generator
+
+    Returns:
+        None
+    """
+
+    snapshot = MeshSnapshot(obj_name)
+    rng = np.random.default_rng(seed)
+    points = randomize_face_points(snapshot.points, snapshot.face_offsets, snapshot.face_vertices, rng, move_thresh,
+                                   rotate_thresh, move_bias, rotate_bias, component_space)
+    set_points(obj_name, points)
+
+    # Harden edges
+    cmds.select(obj_name, r=True)
+    cmds.polySoftEdge(angle=0)
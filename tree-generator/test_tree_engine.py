@@ -0,0 +1,32 @@
+import numpy as np
+
+from tree_engine import generate_forest
+# tree_engine already put the root of the repo on the path
+from utils import MeshTopology, get_face_centroids, get_face_vector_areas
+
+
+def test_forest_same_for_any_worker_count():
+    serial = generate_forest(6, seed=3, workers=0)
+    pooled = generate_forest(6, seed=3, workers=2)
+    assert len(serial) == len(pooled) == 6
+    for a, b in zip(serial, pooled):
+        assert sorted(a) == sorted(b) == ["leaves", "trunk"]
+        for key in a:
+            for x, y in zip(a[key], b[key]):
+                assert np.array_equal(x, y)
+    # Every tree gets a seed of it's own
+    assert not np.array_equal(serial[0]["trunk"][0], serial[1]["trunk"][0])
+
+
+def test_trunk_closed_and_manifold():
+    for tree in generate_forest(4, seed=11, workers=0):
+        for points, face_offsets, face_vertices in (tree["trunk"], tree["leaves"]):
+            topology = MeshTopology(len(points), face_offsets, face_vertices)
+            # Closed and manifold means exactly two faces on every edge
+            assert (np.diff(topology.edge_face_offsets) == 2).all()
+            # Consistently wound, so twin half-edges run in opposite directions
+            twins = topology.half_edge_twins
+            assert (face_vertices == face_vertices[topology.half_edge_next[twins]]).all()
+            # and wound outwards, which gives the enclosed volume a positive sign
+            volume = np.sum(get_face_vector_areas(points, face_offsets, face_vertices) * get_face_centroids(points, face_offsets, face_vertices)) / 3
+            assert volume > 0
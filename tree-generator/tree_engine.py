@@ -0,0 +1,252 @@
+#! /usr/bin/env python3
+
+# Builds the same kind of trees as tree_generator.py as mesh arrays, without maya
+# Meshes are (points, face_offsets, face_vertices) tuples, the way utils.MeshSnapshot stores them
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# utils lives at the root of the repo, everything in it that doesn't touch the scene works without maya
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils import MeshTopology, get_face_centroids, get_face_vector_areas, get_next_corners, randomize_face_points, write_obj
+
+
+def combine(meshes):
+    """Merges several meshes into one"""
+    points, counts, face_vertices = [], [], []
+    num_points = 0
+    for mesh_points, face_offsets, mesh_face_vertices in meshes:
+        points.append(mesh_points)
+        counts.append(np.diff(face_offsets))
+        face_vertices.append(mesh_face_vertices + num_points)
+        num_points += len(mesh_points)
+    face_offsets = np.concatenate([[0], np.cumsum(np.concatenate(counts))]).astype(np.int64)
+    return np.concatenate(points), face_offsets, np.concatenate(face_vertices)
+
+
+def cylinder(height=8, sections=6, spans=5, radius=1):
+    """Same layout as cmds.polyCylinder(h=height, sx=sections, sy=spans, sc=1), centered on the origin
+
+    Faces go sides first, then the bottom and top caps as triangle fans
+    """
+    angles = 2 * np.pi * np.arange(sections) / sections
+    ring = np.stack([np.cos(angles), np.zeros(sections), -np.sin(angles)], axis=1) * radius
+    ys = np.linspace(-height / 2, height / 2, spans + 1)
+    points = np.concatenate([ring + [0, y, 0] for y in ys] + [[[0, ys[0], 0], [0, ys[-1], 0]]])
+
+    i = np.arange(sections)
+    j = (i + 1) % sections
+    sides = [np.stack([i, j, j + sections, i + sections], axis=1) + span * sections for span in range(spans)]
+    bottom, top = len(points) - 2, len(points) - 1
+    bottom_cap = np.stack([np.full(sections, bottom), j, i], axis=1)
+    top_cap = np.stack([np.full(sections, top), i + spans * sections, j + spans * sections], axis=1)
+
+    quads = np.concatenate(sides).ravel()
+    face_offsets = np.concatenate([np.arange(0, len(quads) + 1, 4), len(quads) + np.arange(3, 6 * sections + 1, 3)])
+    return points, face_offsets, np.concatenate([quads, bottom_cap.ravel(), top_cap.ravel()])
+
+
+def icosahedron(radius=1):
+    """Same shape as cmds.polyPlatonicSolid(st=1, r=radius)"""
+    phi = (1 + 5 ** 0.5) / 2
+    points = np.array([
+        (-1, phi, 0), (1, phi, 0), (-1, -phi, 0), (1, -phi, 0),
+        (0, -1, phi), (0, 1, phi), (0, -1, -phi), (0, 1, -phi),
+        (phi, 0, -1), (phi, 0, 1), (-phi, 0, -1), (-phi, 0, 1),
+    ], dtype=np.float64)
+    faces = np.array([
+        (0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11),
+        (1, 5, 9), (5, 11, 4), (11, 10, 2), (10, 7, 6), (7, 1, 8),
+        (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
+        (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1),
+    ], dtype=np.int64)
+    points *= radius / np.linalg.norm(points[0])
+    return points, np.arange(0, faces.size + 1, 3), faces.ravel()
+
+
+def subdivide(mesh):
+    """Splits every n-gon into n quads around it's center, like a linear cmds.polySmooth with one division"""
+    points, face_offsets, face_vertices = mesh
+    topology = MeshTopology(len(points), face_offsets, face_vertices)
+    midpoints = points[topology.edges].mean(axis=1)
+    centroids = get_face_centroids(points, face_offsets, face_vertices)
+
+    # Every face corner becomes a quad: the corner, the middle of the next edge, the face center and the middle of the previous edge
+    previous = np.empty_like(topology.half_edge_next)
+    previous[topology.half_edge_next] = np.arange(len(previous))
+    num_points, num_edges = len(points), len(midpoints)
+    quads = np.stack([
+        face_vertices,
+        num_points + topology.half_edge_edges,
+        num_points + num_edges + topology.half_edge_faces,
+        num_points + topology.half_edge_edges[previous],
+    ], axis=1)
+    return np.concatenate([points, midpoints, centroids]), np.arange(0, quads.size + 1, 4), quads.ravel()
+
+
+def flare(points, start_flare_x=1, end_flare_x=1, curve=0):
+    """Flare deformer fitted to the bounding box along Y, scales X from start_flare_x at the bottom to end_flare_x at the top"""
+    y = points[:, 1]
+    t = (y - y.min()) / max(np.ptp(y), 1e-9)
+    scale = start_flare_x + (end_flare_x - start_flare_x) * t + curve * np.sin(np.pi * t)
+    return points * np.stack([scale, np.ones_like(t), np.ones_like(t)], axis=1)
+
+
+def bend(points, curvature, rotation=0, origin=(0, 0, 0), scale=1, low_bound=-1, high_bound=1):
+    """Bend deformer with it's handle at origin, rotated around Y by rotation degrees and scaled by scale
+
+    Curvature is the bend in degrees per unit of handle length, past the bounds points carry on straight
+    """
+    curvature = np.radians(curvature)
+    if abs(curvature) < 1e-9:
+        return points.copy()
+    angle = np.radians(rotation)
+    rotate = np.array([[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]])
+    x, y, z = ((points - origin).dot(rotate) / scale).T
+
+    clamped = np.clip(y, low_bound, high_bound)
+    theta = curvature * clamped
+    radius = 1 / curvature
+    bent_x = radius - (radius - x) * np.cos(theta) + (y - clamped) * np.sin(theta)
+    bent_y = (radius - x) * np.sin(theta) + (y - clamped) * np.cos(theta)
+    return (np.stack([bent_x, bent_y, z], axis=1) * scale).dot(rotate.T) + origin
+
+
+def extrude(mesh, faces, ltz=0, ty=0, scale=1):
+    """cmds.polyExtrudeFacet(ltz=ltz, ty=ty) followed by cmds.scale(scale, scale, scale, cs=True) on the new faces
+
+    Connected faces are extruded together, the extruded faces keep their ids and the side faces are added after them
+    """
+    points, face_offsets, face_vertices = mesh
+    faces = np.atleast_1d(faces)
+    counts = np.diff(face_offsets)
+    region = np.zeros(len(counts), dtype=bool)
+    region[faces] = True
+    in_region = np.repeat(region, counts)
+
+    starts, ends = face_vertices, face_vertices[get_next_corners(face_offsets)]
+
+    # Edges only one of the extruded faces uses are on the border of the region and get a side face
+    corners = np.flatnonzero(in_region)
+    keys = np.minimum(starts[corners], ends[corners]) * len(points) + np.maximum(starts[corners], ends[corners])
+    _, inverse, edge_counts = np.unique(keys, return_inverse=True, return_counts=True)
+    border = corners[edge_counts[inverse.reshape(-1)] == 1]
+
+    verts = np.unique(face_vertices[corners])
+    new_ids = np.full(len(points), -1, dtype=np.int64)
+    new_ids[verts] = len(points) + np.arange(len(verts))
+
+    normal = get_face_vector_areas(points, face_offsets, face_vertices)[faces].sum(axis=0)
+    normal /= max(np.linalg.norm(normal), 1e-12)
+    new_points = points[verts] + normal * ltz + [0, ty, 0]
+    center = (new_points.min(axis=0) + new_points.max(axis=0)) / 2
+    new_points = center + (new_points - center) * scale
+
+    face_vertices = face_vertices.copy()
+    face_vertices[corners] = new_ids[face_vertices[corners]]
+    sides = np.stack([starts[border], ends[border], new_ids[ends[border]], new_ids[starts[border]]], axis=1)
+    face_offsets = np.concatenate([face_offsets, face_offsets[-1] + np.arange(4, sides.size + 1, 4)])
+    return np.concatenate([points, new_points]), face_offsets, np.concatenate([face_vertices, sides.ravel()])
+
+
+def create_trunk(rng):
+    points, face_offsets, face_vertices = cylinder(height=8, sections=6, spans=5)
+    curve = rng.uniform(-0.5, 0)
+    start_flare_x, end_flare_x = rng.uniform(0.6, 1.6, 2)
+    points = flare(points, start_flare_x, end_flare_x, curve)
+    # The bend handle is fitted to the trunk, then moved down to it's base
+    curvature, rotation = rng.uniform(-20, 20), rng.uniform(0, 360)
+    points = bend(points, curvature, rotation, origin=(0, -4, 0), scale=4, high_bound=5)
+    return points, face_offsets, face_vertices
+
+
+def create_blob(rng, size=2):
+    mesh = subdivide(icosahedron(size))
+    points = randomize_face_points(*mesh, rng=rng, move_bias=[2, 1, 3])
+    return points, mesh[1], mesh[2]
+
+
+def create_branches(mesh, rng, num_branches=4, max_iterations=4, length_range=(0.5, 1.5), height_range=(0.2, 1.5)):
+    # Only quads above 0 on the Y axis can grow branches
+    centroids = get_face_centroids(*mesh)
+    candidates = np.flatnonzero((np.diff(mesh[1]) > 3) & (centroids[:, 1] > 0))
+    if len(candidates) < num_branches:
+        raise Exception("Only {} faces can grow branches, {} were asked for".format(len(candidates), num_branches))
+    branch_faces = rng.choice(candidates, num_branches, replace=False)
+    for face in branch_faces:
+        mesh = extrude(mesh, face, scale=0.7)
+        for i in range(rng.integers(1, max_iterations + 1)):
+            ty = rng.uniform(*height_range)
+            ltz = rng.uniform(*length_range)
+            mesh = extrude(mesh, face, ltz=ltz, ty=ty, scale=0.6)
+    return mesh, branch_faces
+
+
+def grow_trunk(mesh, length=3):
+    # The top cap is the only set of triangles above 0
+    centroids = get_face_centroids(*mesh)
+    top_faces = np.flatnonzero((np.diff(mesh[1]) == 3) & (centroids[:, 1] > 0))
+    if not len(top_faces):
+        raise Exception("No triangles above 0 on the Y axis to grow")
+    return extrude(mesh, top_faces, ltz=length, scale=0.6), top_faces
+
+
+def create_leaves(mesh, faces, rng, size_range=(2, 3)):
+    centroids = get_face_centroids(*mesh)
+    blobs = []
+    for pos in centroids[faces]:
+        if pos[1] < 2:
+            continue
+        points, face_offsets, face_vertices = create_blob(rng, size=rng.uniform(*size_range))
+        blobs.append((points + pos, face_offsets, face_vertices))
+    return blobs
+
+
+def generate_tree(seed=None):
+    """Builds a whole tree from a seed
+
+    Args:
+        seed (int or np.random.SeedSequence): the same seed always builds the same tree
+
+    Returns:
+        dict: trunk and leaves meshes as (points, face_offsets, face_vertices)
+    """
+    rng = np.random.default_rng(seed)
+    trunk = create_trunk(rng)
+    trunk, branch_ends = create_branches(trunk, rng)
+    trunk, top_faces = grow_trunk(trunk)
+    leaves = create_leaves(trunk, branch_ends, rng)
+    # Creating a bigger leaf blob for the top of the trunk
+    leaves += create_leaves(trunk, top_faces[:1], rng, size_range=(3, 5))
+    return {"trunk": trunk, "leaves": combine(leaves)}
+
+
+def generate_forest(num_trees, seed=None, workers=None):
+    """Builds many trees across a process pool
+
+    Every tree gets it's own seed spawned from seed, so the forest is the same no matter how many workers build it
+
+    Args:
+        num_trees (int): number of trees to build
+        seed (int): seed for the whole forest
+        workers (int): number of processes, defaults to one per CPU, 0 builds the trees in this process
+
+    Returns:
+        dict[]: the trunk and leaves meshes of every tree, as generate_tree returns them
+    """
+    seeds = np.random.SeedSequence(seed).spawn(num_trees)
+    if workers == 0:
+        return [generate_tree(i) for i in seeds]
+    chunksize = max(1, num_trees // (4 * (workers or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_tree, seeds, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    os.makedirs("forest", exist_ok=True)
+    for i, tree in enumerate(generate_forest(16, seed=0)):
+        write_obj(os.path.join("forest", "tree{}_trunk.obj".format(i + 1)), *tree["trunk"])
+        write_obj(os.path.join("forest", "tree{}_leaves.obj".format(i + 1)), *tree["leaves"])
@@ -1,7 +1,10 @@
 from __future__ import print_function, division
 
 import maya.cmds as cmds
+import math
+import numpy as np
 import random
+from collections import OrderedDict
 
 def create_trunk():
     obj_name, _ = cmds.polyCylinder(h=8, sx=6, sy=5, sc=1)   
@@ -12,67 +15,179 @@ def create_trunk():
     cmds.DeleteAllHistory()
     return obj_name
 
-def create_blob(size=2):
+def create_blob(size=2, seed=None):
     obj_name, _ = cmds.polyPlatonicSolid(st=1, r=size)
     cmds.polySmooth(mth=1) # Linear smooth
-    randomize_faces(move_bias = [2,1,3])
+    randomize_faces(move_bias = [2,1,3], seed=seed)
     return obj_name
+
+class BlobLibrary(object):
+    """Pre-randomized leaf blobs that leaves are instanced or copied from, instead of building a new blob for each
+
+    Sizes are snapped to buckets bucket_size apart and every bucket gets up to variants blobs, leaves are scaled from
+    the bucket size to their own size. Past max_prototypes the least recently used prototype is deleted, leaves
+    instanced from it keep the shape.
+
+    Args:
+        variants (int): number of differently randomized blobs per size bucket
+        bucket_size (float): spacing between the sizes prototypes are built at
+        max_prototypes (int): number of prototypes kept in the scene
+        seed (int): seed for the prototypes and how leaves pick and turn them, the same seed always builds the same blobs
+        instance (bool): instance the prototypes, otherwise leaves are duplicates that can be edited on their own
+    """
+
+    def __init__(self, variants=4, bucket_size=0.5, max_prototypes=32, seed=None, instance=True):
+        self.variants = variants
+        self.bucket_size = bucket_size
+        self.max_prototypes = max_prototypes
+        self.seed = seed
+        self.instance = instance
+        # Variants and turns come from the library's own generator so the same seed always places the same blobs
+        self.rand = random.Random(seed)
+        self.prototypes = OrderedDict()
+        self.group = None
+
+    def __repr__(self):
+        return "BlobLibrary({} prototypes)".format(len(self.prototypes))
+
+    def __len__(self):
+        return len(self.prototypes)
+
+    def prototype(self, bucket, variant):
+        """Returns the prototype blob for a size bucket and variant, building it the first time it's needed"""
+        key = (self.seed, bucket, variant)
+        if key in self.prototypes:
+            # Re-inserting moves it to the end, the most recently used side
+            self.prototypes[key] = self.prototypes.pop(key)
+            return self.prototypes[key]
+
+        if self.group is None or not cmds.objExists(self.group):
+            self.group = cmds.group(empty=True, name="leaf_prototypes")
+            cmds.hide(self.group)
+        seed = None if self.seed is None else "{}_{}_{}".format(*key)
+        blob = create_blob(size=bucket * self.bucket_size, seed=seed)
+        self.prototypes[key] = cmds.parent(blob, self.group)[0]
+
+        while len(self.prototypes) > self.max_prototypes:
+            _, oldest = self.prototypes.popitem(last=False)
+            cmds.delete(oldest)
+        return self.prototypes[key]
+
+    def create(self, size, pos):
+        """Places a blob of the given size at pos, made from a random variant of the closest size bucket
+
+        Returns:
+            str: name of the new blob
+        """
+        bucket = max(1, int(round(size / self.bucket_size)))
+        prototype = self.prototype(bucket, self.rand.randrange(self.variants))
+        blob = cmds.instance(prototype)[0] if self.instance else cmds.duplicate(prototype)[0]
+        blob = cmds.parent(blob, world=True)[0]
+        scale = size / (bucket * self.bucket_size)
+        # A random turn around Y keeps neighbouring copies of the same variant from lining up
+        cmds.xform(blob, ws=True, t=pos, s=[scale] * 3, ro=[0, self.rand.uniform(0, 360), 0])
+        return blob
+
+    def clear(self):
+        """Deletes every prototype, instanced leaves keep their shapes"""
+        if self.group is not None and cmds.objExists(self.group):
+            cmds.delete(self.group)
+        self.prototypes.clear()
+        self.group = None
     
-def create_branches(obj_name, num_branches=4, max_iterations=4, length_range=(0.5, 1.5), height_range=(0.2, 1.5)):
-    num_faces = cmds.polyEvaluate(obj_name, f=True)
-    branch_faces = []
-    while len(branch_faces) < num_branches:
-        rand_face = random.randint(0, num_faces)
-        cmds.select("{}.f[{}]".format(obj_name, rand_face))
-        face_verts = format_polyinfo(cmds.polyInfo(fv=True))
-        # Only accepting quads and faces above 0 on the Y axis
-        if len(face_verts) > 3 and get_position()[1] > 0 and rand_face not in branch_faces:
-            branch_faces.append(rand_face)
+def create_branches(obj_name, num_branches=4, max_iterations=4, length_range=(0.5, 1.5), height_range=(0.2, 1.5), seed=None):
+    rand = random.Random(seed)
+    snapshot = MeshSnapshot(obj_name)
+    # Only accepting quads and faces above 0 on the Y axis
+    candidates = np.flatnonzero((snapshot.face_vertex_counts > 3) & (snapshot.face_centroids[:, 1] > 0)).tolist()
+    if len(candidates) < num_branches:
+        raise Exception("{} only has {} faces that can grow branches, {} were asked for".format(obj_name, len(candidates), num_branches))
+    branch_faces = rand.sample(candidates, num_branches)
     branch_ends = []
     for face in branch_faces:
         cmds.select("{}.f[{}]".format(obj_name, face))
         cmds.polyExtrudeFacet()
         cmds.scale(0.7, 0.7, 0.7, cs=True)
-        iterations = random.randint(1, max_iterations)
+        iterations = rand.randint(1, max_iterations)
         for i in range(iterations):
-            ty = random.uniform(*height_range)
-            ltz = random.uniform(*length_range)
+            ty = rand.uniform(*height_range)
+            ltz = rand.uniform(*length_range)
             cmds.polyExtrudeFacet(ltz=ltz, ty=ty)
             cmds.scale(0.6, 0.6, 0.6, cs=True)
         branch_ends.append(cmds.ls(selection=True)[0])
     return branch_ends
 
-def create_leaves(dest_obj, dest_faces, size_range=(2,3)):
+def create_leaves(dest_obj, dest_faces, size_range=(2,3), library=None):
     for face in dest_faces:
         cmds.select(face, r=True)
         pos = get_position()
         if pos[1] < 2:
             continue
         size = random.uniform(*size_range)
+        if library is not None:
+            library.create(size, pos)
+            continue
         blob = create_blob(size=size)
         cmds.select(blob, r=True)
         cmds.move(*pos, ws=True)
 
 def grow_trunk(obj_name, length=3):
-    num_faces = cmds.polyEvaluate(obj_name, f=True)
-    top_faces = []
-    for i in range(num_faces):
-        cmds.select("{}.f[{}]".format(obj_name, i))
-        if cmds.polyEvaluate(tc=True) == 1 and get_position()[1] > 0:
-            top_faces.append(i)
-    cmds.select(cl=True)
-    for id in top_faces:
-        cmds.select("{}.f[{}]".format(obj_name, id), add=True)
+    snapshot = MeshSnapshot(obj_name)
+    # The top cap is the only set of triangles above 0 on the Y axis
+    top_faces = np.flatnonzero((snapshot.face_triangle_counts == 1) & (snapshot.face_centroids[:, 1] > 0)).tolist()
+    if not top_faces:
+        raise Exception("{} has no triangles above 0 on the Y axis to grow".format(obj_name))
+    cmds.select(ComponentSelection.from_ids(obj_name, "f", top_faces).names(), r=True)
     cmds.polyExtrudeFacet(ltz=length)
     cmds.scale(0.6, 0.6, 0.6, cs=True)
     return top_faces
 
-def generate_tree():
+def generate_tree(library=None, seed=None):
+    """Builds a tree, leaves come from library if one is given so many trees can share a few blobs
+
+    seed only fixes where the branches go and how they grow, the trunk and leaves stay random
+    """
     trunk = create_trunk()
-    branch_ends = create_branches(trunk)
+    branch_ends = create_branches(trunk, seed=seed)
     top_faces = grow_trunk(trunk)
-    create_leaves(trunk, branch_ends)
+    create_leaves(trunk, branch_ends, library=library)
     # Creating a bigger leaf blob for the top of the trunk
-    create_leaves(trunk, ["{}.f[{}]".format(trunk, top_faces[0])], size_range=(3,5))
+    create_leaves(trunk, ["{}.f[{}]".format(trunk, top_faces[0])], size_range=(3,5), library=library)
+
+def create_tree_meshes(tree, name="tree", offset=(0, 0, 0)):
+    """Creates the trunk and leaves built by tree_engine, one create_mesh call each"""
+    points, face_offsets, face_vertices = tree["trunk"]
+    trunk = create_mesh("{}_trunk".format(name), points + offset, face_offsets, face_vertices)
+    points, face_offsets, face_vertices = tree["leaves"]
+    leaves = create_mesh("{}_leaves".format(name), points + offset, face_offsets, face_vertices)
+    # Meshes made through the API have no shader yet
+    cmds.sets([trunk, leaves], e=True, forceElement="initialShadingGroup")
+    # Hard edges like randomize_faces leaves on the blobs
+    cmds.polySoftEdge(leaves, angle=0, ch=False)
+    return trunk, leaves
+
+def create_forest(num_trees, seed=None, spacing=20, workers=0):
+    """Builds trees with tree_engine and lays them out on a grid
+
+    tree_engine is imported from this folder, which has to be on sys.path. Workers other than 0 build the trees
+    in a process pool, which only works from mayapy or a standalone python since every worker starts a new interpreter.
+
+    Args:
+        num_trees (int): number of trees to create
+        seed (int): the same seed always creates the same forest
+        spacing (float): distance between trees on the grid
+        workers (int): number of processes to build the trees with, None for one per CPU
+
+    Returns:
+        (str, str)[]: trunk and leaves objects of every tree
+    """
+    from tree_engine import generate_forest
+    trees = generate_forest(num_trees, seed=seed, workers=workers)
+    columns = int(math.ceil(math.sqrt(num_trees)))
+    objs = []
+    for i, tree in enumerate(trees):
+        offset = ((i % columns) * spacing, 0, (i // columns) * spacing)
+        objs.append(create_tree_meshes(tree, "tree{}".format(i + 1), offset))
+    return objs
 
 generate_tree()
\ No newline at end of file
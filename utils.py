@@ -3,7 +3,17 @@ from __future__ import division
 import string
 import re
 import math
-import maya.cmds as cmds
+import hashlib
+
+import numpy as np
+
+try:
+    import maya.cmds as cmds
+    import maya.api.OpenMaya as om
+except ImportError:
+    # Outside of maya a backend has to be passed to anything that queries the scene
+    cmds = None
+    om = None
 
 class Component:
     """Basic struct for maya components"""
@@ -23,23 +33,627 @@ class Component:
         return "".join(re.findall(r"\[(\d+)\]", self.name))
 
 
+COMPONENT_RE = re.compile(r"^(?P<obj>[^.]+)\.(?P<kind>[a-z]+)\[(?P<ids>[^\]]+)\]$")
+
+
+def merge_ranges(ranges):
+    """Sorts Nx2 inclusive [start, end] ranges and merges the ones that overlap or touch"""
+    ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+    if not len(ranges):
+        return ranges
+    ranges = ranges[np.argsort(ranges[:, 0], kind="stable")]
+    ends = np.maximum.accumulate(ranges[:, 1])
+    # A range starts a new group when it begins past the end of everything before it
+    starts = np.flatnonzero(np.concatenate([[True], ranges[1:, 0] > ends[:-1] + 1]))
+    return np.stack([ranges[starts, 0], ends[np.append(starts[1:], len(ranges)) - 1]], axis=1)
+
+
+class ComponentSelection(object):
+    """Components of one kind on one object, stored as sorted id ranges instead of a string per component
+
+    Ranges are inclusive like maya's packed notation, so a selection of millions of components stays as small
+    as the number of ranges it's made of. Iterating gives the component names one at a time.
+
+    Args:
+        obj_name (str): name of the object the components are on
+        kind (str): component type, vtx, e, f, ...
+        ranges (int[][]): Nx2 inclusive [start, end] id ranges, in any order and allowed to overlap
+    """
+
+    __slots__ = ("obj_name", "kind", "ranges")
+
+    def __init__(self, obj_name, kind, ranges=()):
+        self.obj_name = obj_name
+        self.kind = kind
+        self.ranges = merge_ranges(ranges)
+
+    @classmethod
+    def from_ids(cls, obj_name, kind, ids):
+        """Builds a selection from a list of component ids"""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        breaks = np.flatnonzero(np.diff(ids) != 1)
+        starts = np.concatenate([[0], breaks + 1]) if len(ids) else breaks
+        ends = np.append(breaks, len(ids) - 1) if len(ids) else breaks
+        return cls(obj_name, kind, np.stack([ids[starts], ids[ends]], axis=1))
+
+    @staticmethod
+    def _parse_name(name):
+        """Splits a packed component name like pPlane1.vtx[0:99] into (obj_name, kind, start, end)"""
+        match = COMPONENT_RE.match(name)
+        if match is None:
+            raise Exception("{} is not a component".format(name))
+        ids = match.group("ids")
+        if ids == "*":
+            raise Exception("Can't tell how many components {} covers, list it with cmds.ls first".format(name))
+        start, _, end = ids.partition(":")
+        return match.group("obj"), match.group("kind"), int(start), int(end or start)
+
+    @classmethod
+    def from_name(cls, name):
+        """Parses a single packed component name like pPlane1.vtx[0:99]"""
+        obj_name, kind, start, end = cls._parse_name(name)
+        return cls(obj_name, kind, [[start, end]])
+
+    @classmethod
+    def from_names(cls, names):
+        """Parses packed component names (like cmds.ls(selection=True) returns) into one selection per object and kind"""
+        # Ranges are gathered per object and kind and merged once, instead of combining selections name by name
+        ranges = {}
+        for name in names:
+            if isinstance(name, cls):
+                ranges.setdefault((name.obj_name, name.kind), []).extend(name.ranges.tolist())
+                continue
+            obj_name, kind, start, end = cls._parse_name(name)
+            ranges.setdefault((obj_name, kind), []).append((start, end))
+        return [cls(obj_name, kind, i) for (obj_name, kind), i in ranges.items()]
+
+    def __repr__(self):
+        return "ComponentSelection({}.{}: {} components in {} ranges)".format(self.obj_name, self.kind, len(self), len(self.ranges))
+
+    def __len__(self):
+        return int((self.ranges[:, 1] - self.ranges[:, 0] + 1).sum())
+
+    def __iter__(self):
+        for start, end in self.ranges.tolist():
+            for i in range(start, end + 1):
+                yield "{}.{}[{}]".format(self.obj_name, self.kind, i)
+
+    def __contains__(self, item):
+        """Tests an id, a component name or a ComponentSelection, ranges like pCube1.f[2:5] have to be covered entirely"""
+        if isinstance(item, (int, np.integer)):
+            ranges = np.array([[item, item]])
+        else:
+            if not isinstance(item, ComponentSelection):
+                if COMPONENT_RE.match(item) is None:
+                    return False
+                item = ComponentSelection.from_name(item)
+            if (item.obj_name, item.kind) != (self.obj_name, self.kind):
+                return False
+            ranges = item.ranges
+        if not len(self.ranges):
+            return not len(ranges)
+        # Ranges are merged, so a covered range always sits inside a single one of ours
+        idx = np.searchsorted(self.ranges[:, 0], ranges[:, 0], side="right") - 1
+        return bool(((idx >= 0) & (ranges[:, 1] <= self.ranges[np.maximum(idx, 0), 1])).all())
+
+    def __eq__(self, other):
+        return (isinstance(other, ComponentSelection) and (self.obj_name, self.kind) == (other.obj_name, other.kind)
+                and np.array_equal(self.ranges, other.ranges))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    @property
+    def ids(self):
+        """Every component id as a sorted array"""
+        sizes = self.ranges[:, 1] - self.ranges[:, 0] + 1
+        return np.repeat(self.ranges[:, 0] - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+
+    def names(self):
+        """Returns the selection in maya's packed notation, ready to pass to cmds"""
+        return ["{}.{}[{}]".format(self.obj_name, self.kind, start if start == end else "{}:{}".format(start, end))
+                for start, end in self.ranges.tolist()]
+
+    def _combine(self, other, keep):
+        """Applies a boolean operation to the membership of both selections, one span between range bounds at a time"""
+        if (self.obj_name, self.kind) != (other.obj_name, other.kind):
+            raise Exception("Can't combine {} with {}".format(self, other))
+        bounds = np.unique(np.concatenate([self.ranges.ravel(), other.ranges.ravel()]) + np.tile([0, 1], len(self.ranges) + len(other.ranges)))
+        if len(bounds) < 2:
+            return ComponentSelection(self.obj_name, self.kind)
+        spans = bounds[:-1]
+        kept = keep(self._covers(spans), other._covers(spans))
+        return ComponentSelection(self.obj_name, self.kind, np.stack([spans[kept], bounds[1:][kept] - 1], axis=1))
+
+    def _covers(self, ids):
+        if not len(self.ranges):
+            return np.zeros(len(ids), dtype=bool)
+        idx = np.searchsorted(self.ranges[:, 0], ids, side="right") - 1
+        return (idx >= 0) & (ids <= self.ranges[np.maximum(idx, 0), 1])
+
+    def __or__(self, other):
+        return self._combine(other, np.logical_or)
+
+    def __and__(self, other):
+        return self._combine(other, np.logical_and)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def __xor__(self, other):
+        return self._combine(other, np.logical_xor)
+
+
+class MeshSnapshot(object):
+    """Bulk copy of a mesh's points, face centroids and face normals
+
+    Every scene query happens once on construction, lookups are served from memory afterwards.
+
+    Args:
+        obj_name (str): name of the mesh to snapshot
+        object_space (bool): store positions and normals in object space instead of world space
+        backend (module): anything exposing the maya.cmds interface, defaults to maya.cmds
+
+    Attributes:
+        points (np.ndarray): Vx3 vertex positions
+        face_offsets (np.ndarray): F+1 offsets into face_vertices, face i is face_vertices[face_offsets[i]:face_offsets[i + 1]]
+        face_vertices (np.ndarray): flat vertex ids of every face
+        face_centroids (np.ndarray): Fx3 average of each face's vertex positions
+        face_normals (np.ndarray): Fx3 unit face normals
+        face_vertex_counts (np.ndarray): number of vertices of each face
+        face_triangle_counts (np.ndarray): number of triangles each face splits into, like polyEvaluate(tc=True) per face
+    """
+
+    def __init__(self, obj_name, object_space=False, backend=None):
+        self.backend = backend if backend is not None else cmds
+        if self.backend is None:
+            raise Exception("maya.cmds is not available, pass a backend to snapshot {}".format(obj_name))
+        self.name = obj_name
+        self.object_space = object_space
+        space = {"os": True} if object_space else {"ws": True}
+
+        self.translation = self.backend.xform(obj_name, q=True, translation=True, **space)
+        points = self.backend.xform("{}.vtx[*]".format(obj_name), q=True, translation=True, **space)
+        self.points = np.array(points, dtype=np.float64).reshape(-1, 3)
+
+        self.face_offsets, self.face_vertices = self._polyinfo(fv=True)
+        self.face_vertex_counts = np.diff(self.face_offsets)
+        self.face_triangle_counts = self.face_vertex_counts - 2
+
+        # Centroids are averaged from the snapshotted points so they are already in the right space
+        self.face_centroids = get_face_centroids(self.points, self.face_offsets, self.face_vertices)
+
+        # polyInfo always reports normals in object space
+        normals = self._polyinfo(fn=True, flt=True)[1].reshape(-1, 3)
+        if not object_space:
+            matrix = np.array(self.backend.xform(obj_name, q=True, matrix=True, ws=True)).reshape(4, 4)
+            normals = normals.dot(np.linalg.inv(matrix[:3, :3]).T)
+        self.face_normals = normalize(normals)
+
+        self._edge_vertices = None
+        self._face_areas = None
+        self._topology = None
+
+    def __repr__(self):
+        return "MeshSnapshot({}: {} verts, {} faces)".format(self.name, self.num_verts, self.num_faces)
+
+    def _polyinfo(self, flt=False, **flags):
+        _, offsets, values = parse_polyinfo(self.backend.polyInfo(self.name, **flags), flt=flt)
+        return offsets, values
+
+    @property
+    def num_verts(self):
+        return len(self.points)
+
+    @property
+    def num_faces(self):
+        return len(self.face_offsets) - 1
+
+    @property
+    def edge_vertices(self):
+        """Ex2 vertex ids of every edge, only queried the first time it's needed"""
+        if self._edge_vertices is None:
+            offsets, values = self._polyinfo(ev=True)
+            self._edge_vertices = values[offsets[:-1, None] + np.arange(2)].reshape(-1, 2)
+        return self._edge_vertices
+
+    @property
+    def topology(self):
+        """MeshTopology of the mesh with maya's edge ids, only built the first time it's needed"""
+        if self._topology is None:
+            self._topology = MeshTopology(self.num_verts, self.face_offsets, self.face_vertices, self.edge_vertices)
+        return self._topology
+
+    @property
+    def face_areas(self):
+        """Area of every face, only computed the first time it's needed"""
+        if self._face_areas is None:
+            vector_areas = get_face_vector_areas(self.points, self.face_offsets, self.face_vertices)
+            self._face_areas = np.linalg.norm(vector_areas, axis=1)
+        return self._face_areas
+
+    def face_vertex_ids(self, face_id):
+        """Returns the vertex ids of a face"""
+        return self.face_vertices[self.face_offsets[face_id]:self.face_offsets[face_id + 1]]
+
+    def component_positions(self, kind, ids):
+        """Returns an Nx3 array of positions for component ids of a given kind (vtx, f, e)"""
+        if kind == "vtx":
+            return self.points[ids]
+        if kind == "f":
+            return self.face_centroids[ids]
+        if kind == "e":
+            return self.points[self.edge_vertices[ids]].mean(axis=-2)
+        raise Exception("Unsupported component type: {}".format(kind))
+
+    def get_position(self, component=None):
+        """Returns the position of a component (or the object itself) the same way utils.get_position would"""
+        if component is None or component == self.name:
+            return list(self.translation)
+        match = COMPONENT_RE.match(component)
+        if match is None or match.group("obj") != self.name:
+            raise Exception("{} is not a component of {}".format(component, self.name))
+        kind, ids = match.group("kind"), match.group("ids")
+        if ids == "*":
+            ids = slice(None)
+        elif ":" in ids:
+            start, end = [int(i) for i in ids.split(":")]
+            ids = slice(start, end + 1)
+        else:
+            ids = int(ids)
+
+        # Like xform, every vertex touched by the components is averaged
+        if kind == "vtx":
+            verts = np.arange(self.num_verts)[ids]
+        elif kind == "f":
+            faces = np.atleast_1d(np.arange(self.num_faces)[ids])
+            verts = np.concatenate([self.face_vertex_ids(i) for i in faces])
+        elif kind == "e":
+            verts = self.edge_vertices[ids]
+        else:
+            raise Exception("Unsupported component type: {}".format(kind))
+        verts = np.unique(verts)
+        return self.points[verts].mean(axis=0).tolist()
+
+
+class MeshTopology(object):
+    """Half-edge adjacency of a mesh, stored as flat arrays
+
+    Half-edges are numbered in face vertex order, so half-edge h starts at face_vertices[h] and the
+    half-edges of face i are face_offsets[i]:face_offsets[i + 1]. Edges shared by more than two faces
+    are treated like borders, their half-edges have no twin.
+
+    Args:
+        num_verts (int): number of vertices in the mesh
+        face_offsets (int[]): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (int[]): flat vertex ids of every face
+        edges (int[][]): optional Ex2 vertex ids of every edge, pass these to keep maya's edge ids
+
+    Attributes:
+        edges (np.ndarray): Ex2 vertex ids of every edge
+        half_edge_faces (np.ndarray): face of every half-edge
+        half_edge_next (np.ndarray): next half-edge around the same face
+        half_edge_twins (np.ndarray): opposite half-edge on the neighbouring face, -1 on borders
+        half_edge_edges (np.ndarray): edge id of every half-edge
+        vertex_face_offsets (np.ndarray): V+1 offsets into vertex_faces
+        vertex_faces (np.ndarray): sorted face ids around every vertex
+        vertex_edge_offsets (np.ndarray): V+1 offsets into vertex_edges
+        vertex_edges (np.ndarray): sorted edge ids around every vertex
+        edge_face_offsets (np.ndarray): E+1 offsets into edge_faces
+        edge_faces (np.ndarray): face ids on either side of every edge
+    """
+
+    __slots__ = (
+        "num_verts", "face_offsets", "face_vertices", "edges",
+        "half_edge_faces", "half_edge_next", "half_edge_twins", "half_edge_edges",
+        "vertex_face_offsets", "vertex_faces", "vertex_edge_offsets", "vertex_edges",
+        "edge_face_offsets", "edge_faces",
+    )
+
+    def __init__(self, num_verts, face_offsets, face_vertices, edges=None):
+        self.num_verts = num_verts
+        self.face_offsets = np.asarray(face_offsets, dtype=np.int64)
+        self.face_vertices = np.asarray(face_vertices, dtype=np.int64)
+        counts = np.diff(self.face_offsets)
+        num_half_edges = len(self.face_vertices)
+
+        self.half_edge_faces = np.repeat(np.arange(len(counts)), counts)
+        self.half_edge_next = get_next_corners(self.face_offsets)
+        starts = self.face_vertices
+        ends = self.face_vertices[self.half_edge_next]
+        keys = np.minimum(starts, ends) * num_verts + np.maximum(starts, ends)
+
+        if edges is None:
+            # Numbering edges in the order they first show up in the faces
+            unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            order = np.argsort(first)
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order))
+            self.half_edge_edges = ranks[inverse.reshape(-1)]
+            unique_keys = unique_keys[order]
+            self.edges = np.stack([unique_keys // num_verts, unique_keys % num_verts], axis=1)
+        else:
+            self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+            edge_keys = self.edges.min(axis=1) * num_verts + self.edges.max(axis=1)
+            order = np.argsort(edge_keys)
+            found = np.clip(np.searchsorted(edge_keys[order], keys), 0, max(0, len(order) - 1))
+            if not len(order) or (edge_keys[order][found] != keys).any():
+                raise Exception("Edges don't match the faces of the mesh")
+            self.half_edge_edges = order[found]
+
+        # Half-edges grouped by edge, pairs of them are twins
+        by_edge = np.argsort(self.half_edge_edges, kind="stable")
+        edge_counts = np.bincount(self.half_edge_edges, minlength=len(self.edges))
+        self.edge_face_offsets = np.concatenate([[0], np.cumsum(edge_counts)])
+        self.edge_faces = self.half_edge_faces[by_edge]
+        self.half_edge_twins = np.full(num_half_edges, -1, dtype=np.int64)
+        paired = np.repeat(edge_counts == 2, edge_counts)
+        first, second = by_edge[paired][0::2], by_edge[paired][1::2]
+        self.half_edge_twins[first] = second
+        self.half_edge_twins[second] = first
+
+        by_vertex = np.argsort(self.face_vertices, kind="stable")
+        self.vertex_face_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.face_vertices, minlength=num_verts))])
+        self.vertex_faces = self.half_edge_faces[by_vertex]
+
+        edge_ends = self.edges.reshape(-1)
+        by_vertex = np.argsort(edge_ends, kind="stable")
+        self.vertex_edge_offsets = np.concatenate([[0], np.cumsum(np.bincount(edge_ends, minlength=num_verts))])
+        self.vertex_edges = by_vertex // 2
+
+    def __repr__(self):
+        return "MeshTopology({} verts, {} edges, {} faces)".format(self.num_verts, self.num_edges, self.num_faces)
+
+    @property
+    def num_faces(self):
+        return len(self.face_offsets) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.edges)
+
+    def face_vertex_ids(self, face_id):
+        """Returns the vertex ids of a face"""
+        return self.face_vertices[self.face_offsets[face_id]:self.face_offsets[face_id + 1]]
+
+    def face_edge_ids(self, face_id):
+        """Returns the edge ids of a face, in winding order"""
+        return self.half_edge_edges[self.face_offsets[face_id]:self.face_offsets[face_id + 1]]
+
+    def vertex_face_ids(self, vert_id):
+        """Returns the face ids around a vertex"""
+        return self.vertex_faces[self.vertex_face_offsets[vert_id]:self.vertex_face_offsets[vert_id + 1]]
+
+    def vertex_edge_ids(self, vert_id):
+        """Returns the edge ids around a vertex"""
+        return self.vertex_edges[self.vertex_edge_offsets[vert_id]:self.vertex_edge_offsets[vert_id + 1]]
+
+    def edge_face_ids(self, edge_id):
+        """Returns the face ids on either side of an edge"""
+        return self.edge_faces[self.edge_face_offsets[edge_id]:self.edge_face_offsets[edge_id + 1]]
+
+    def vertex_neighbours(self, vert_id):
+        """Returns the vertex ids connected to a vertex by an edge"""
+        edges = self.edges[self.vertex_edge_ids(vert_id)]
+        return np.where(edges[:, 0] == vert_id, edges[:, 1], edges[:, 0])
+
+    @property
+    def valences(self):
+        """Number of edges around every vertex"""
+        return np.diff(self.vertex_edge_offsets)
+
+    @property
+    def border_edges(self):
+        """Ids of every edge with only one face"""
+        return np.flatnonzero(np.diff(self.edge_face_offsets) == 1)
+
+    @property
+    def border_vertices(self):
+        """Ids of every vertex on a border edge"""
+        return np.unique(self.edges[self.border_edges])
+
+    def gather(self, offsets, values, ids):
+        """Gathers the CSR rows of ids into one flat array
+
+        Returns:
+            owners (np.ndarray): index into ids for every value
+            values (np.ndarray): the values of every row, one row after the other
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        sizes = offsets[ids + 1] - offsets[ids]
+        starts = np.repeat(offsets[ids] - np.cumsum(sizes) + sizes, sizes)
+        return np.repeat(np.arange(len(ids)), sizes), values[starts + np.arange(sizes.sum())]
+
+    def vertex_neighbourhoods(self, vert_ids):
+        """Finds the faces around each vertex and the other vertices of those faces in one pass
+
+        Returns:
+            faces (np.ndarray[]): sorted face ids around each vertex
+            border_verts (np.ndarray[]): sorted vertex ids of those faces, without the vertex itself
+        """
+        vert_ids = np.asarray(vert_ids, dtype=np.int64)
+        owners, faces = self.gather(self.vertex_face_offsets, self.vertex_faces, vert_ids)
+        face_owners, verts = self.gather(self.face_offsets, self.face_vertices, faces)
+        pairs = np.unique(np.stack([owners[face_owners], verts], axis=1), axis=0)
+        pairs = pairs[pairs[:, 1] != vert_ids[pairs[:, 0]]]
+        splits = np.arange(1, len(vert_ids))
+        faces_per_vert = np.split(faces, np.searchsorted(owners, splits))
+        border_per_vert = np.split(pairs[:, 1], np.searchsorted(pairs[:, 0], splits))
+        return faces_per_vert, border_per_vert
+
+    def _loop_step(self, edge_id, vert_id):
+        """Returns the edge continuing an edge loop through vert_id, or -1 if the loop ends there"""
+        faces = self.edge_face_ids(edge_id)
+        candidates = [i for i in self.vertex_edge_ids(vert_id) if i != edge_id and not np.isin(self.edge_face_ids(i), faces).any()]
+        return candidates[0] if len(candidates) == 1 else -1
+
+    def edge_loop(self, edge_id):
+        """Returns the edge ids of the loop through an edge, in order
+
+        Like maya, a loop carries straight on through vertices with four edges (or three on a border)
+        """
+        loop = [edge_id]
+        for direction, vert_id in enumerate(self.edges[edge_id]):
+            edge, vert = edge_id, vert_id
+            walked = []
+            while True:
+                edge = self._loop_step(edge, vert)
+                if edge == -1 or edge == edge_id:
+                    break
+                walked.append(edge)
+                a, b = self.edges[edge]
+                vert = b if a == vert else a
+            if edge == edge_id:
+                # Closed loop, the walk already went all the way around
+                return np.array(loop + walked, dtype=np.int64)
+            loop = loop + walked if direction else walked[::-1] + loop
+        return np.array(loop, dtype=np.int64)
+
+    def _ring_step(self, edge_id, face_id):
+        """Returns the edge opposite edge_id across a quad, or -1 if the face isn't a quad"""
+        edges = self.face_edge_ids(face_id)
+        if len(edges) != 4:
+            return -1
+        return edges[(list(edges).index(edge_id) + 2) % 4]
+
+    def edge_ring(self, edge_id):
+        """Returns the edge ids of the ring through an edge, in order
+
+        A ring steps across quads to the opposite edge, until it reaches a border, a non quad face or itself
+        """
+        ring = [edge_id]
+        faces = self.edge_face_ids(edge_id)
+        if len(faces) > 2:
+            return np.array(ring, dtype=np.int64)
+        for direction, face_id in enumerate(faces):
+            edge, face = edge_id, face_id
+            walked = []
+            while True:
+                edge = self._ring_step(edge, face)
+                if edge == -1 or edge == edge_id:
+                    break
+                walked.append(edge)
+                others = [i for i in self.edge_face_ids(edge) if i != face]
+                if len(others) != 1:
+                    break
+                face = others[0]
+            if edge == edge_id:
+                return np.array(ring + walked, dtype=np.int64)
+            ring = ring + walked if direction else walked[::-1] + ring
+        return np.array(ring, dtype=np.int64)
+
+    def border_loops(self):
+        """Returns every border of the mesh as a list of vertex ids, in the winding order of it's faces"""
+        border = np.flatnonzero(self.half_edge_twins == -1)
+        border = border[np.diff(self.edge_face_offsets)[self.half_edge_edges[border]] == 1]
+        next_border = dict(zip(self.face_vertices[border].tolist(), self.face_vertices[self.half_edge_next[border]].tolist()))
+        loops = []
+        while next_border:
+            start, vert = next_border.popitem()
+            loop = [start]
+            while vert != start and vert in next_border:
+                loop.append(vert)
+                vert = next_border.pop(vert)
+            loops.append(loop)
+        return loops
+
+
+def read_obj(path):
+    """Reads the vertex positions and faces of a .obj file, so meshes can be worked on outside of maya
+
+    Returns:
+        points (np.ndarray): Vx3 vertex positions
+        face_offsets (np.ndarray): F+1 offsets into face_vertices
+        face_vertices (np.ndarray): flat vertex ids of every face
+    """
+    points = []
+    faces = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == "v":
+                points.append([float(i) for i in parts[1:4]])
+            elif parts[0] == "f":
+                # Only the vertex index of v/vt/vn is kept, negative indices count back from the last vertex
+                ids = [int(i.split("/")[0]) for i in parts[1:]]
+                faces.append([i - 1 if i > 0 else len(points) + i for i in ids])
+    counts = [len(i) for i in faces]
+    face_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    face_vertices = np.array([i for face in faces for i in face], dtype=np.int64)
+    return np.array(points, dtype=np.float64).reshape(-1, 3), face_offsets, face_vertices
+
+
+def write_obj(path, points, face_offsets, face_vertices):
+    """Writes vertex positions and faces to a .obj file, the reverse of read_obj"""
+    ids = (np.asarray(face_vertices) + 1).astype(str)
+    with open(path, "w") as f:
+        f.writelines("v {} {} {}\n".format(*i) for i in np.asarray(points).tolist())
+        f.writelines("f {}\n".format(" ".join(ids[start:end])) for start, end in zip(face_offsets[:-1], face_offsets[1:]))
+
+
+# Blanks out the labels (FACE_NORMAL, EDGE, Hard, ...), lowercase e is kept for exponents since none of the labels use it
+POLYINFO_TABLE = dict((ord(i), u" ") for i in string.ascii_letters + "_:" if i != "e")
+
+
+def parse_polyinfo(polyinfo_output, flt=False):
+    """Parses the output of a polyInfo call, usually over a whole mesh, into arrays in one go
+
+    Labels are blanked out and every line end is turned into -inf, so all the numbers are parsed by a single
+    np.fromstring call instead of line by line.
+
+    Args:
+        polyinfo_output (str[]): lines returned by cmds.polyInfo (fn, fv, ef, ev, vf, ...)
+        flt (bool): parse the values as floats, for face normals
+
+    Returns:
+        ids (np.ndarray): component index of every line
+        offsets (np.ndarray): N+1 offsets into values, line i holds values[offsets[i]:offsets[i + 1]]
+        values (np.ndarray): flat values of every line, float64 if flt is set, int64 otherwise
+    """
+    dtype = np.float64 if flt else np.int64
+    text = "".join(polyinfo_output or [])
+    if not text.strip():
+        return np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=dtype)
+    numbers = np.fromstring(text.translate(POLYINFO_TABLE).replace("\n", " -inf ") + " -inf", sep=" ")
+
+    # Blank lines leave sentinels back to back, a line starts after a sentinel and ends at the next one
+    sentinels = np.isneginf(numbers)
+    starts = np.flatnonzero(~sentinels & np.concatenate([[True], sentinels[:-1]]))
+    ends = np.flatnonzero(sentinels & np.concatenate([[False], ~sentinels[:-1]]))
+    values = ~sentinels
+    values[starts] = False
+
+    ids = numbers[starts].astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(ends - starts - 1)]).astype(np.int64)
+    values = numbers[values]
+    return ids, offsets, values.astype(dtype)
+
+
 def format_polyinfo(polyinfo_output, flt=True):
     """Formats string output from cmds.polyInfo to usable data"""
-    out = []
-    for s in polyinfo_output:
-        ascii_filtered = "".join([i for i in s if i not in string.ascii_letters])
-        formatted = ascii_filtered.split(":")[1].split(" ")
-        empty_strings_filtered = filter(None, formatted)
-        newline_filtered = [i for i in empty_strings_filtered if i != u"\n"]
-        converted = [float(i) if flt else int(i) for i in newline_filtered]
-        out.append(converted)
+    _, offsets, values = parse_polyinfo(polyinfo_output, flt=flt)
+    out = [i.tolist() for i in np.split(values, offsets[1:-1])]
     if len(out) > 1:
         return out
     return out[0]
 
 
-def get_position(obj_name=None, object_space=False, rounding=0):
-    """Returns the position of a specified object"""
+def get_position(obj_name=None, object_space=False, rounding=0, snapshot=None):
+    """Returns the position of a specified object
+
+    If a MeshSnapshot is given the position is looked up from memory instead of the scene
+    """
+    if snapshot is not None:
+        if snapshot.object_space != object_space:
+            raise Exception("Snapshot of {} was not taken in the requested space".format(snapshot.name))
+        pos = snapshot.get_position(obj_name)
+        if rounding:
+            return [round(i, rounding) for i in pos]
+        return pos
     if obj_name is not None:
         cmds.select(obj_name, r=True)
     if object_space:
@@ -59,28 +673,157 @@ def get_position(obj_name=None, object_space=False, rounding=0):
     return pos
 
 
+def get_mesh_fn(obj_name):
+    """Returns an MFnMesh for an object"""
+    selection = om.MSelectionList()
+    selection.add(obj_name)
+    return om.MFnMesh(selection.getDagPath(0))
+
+
+def get_mesh_arrays(obj_name, object_space=False):
+    """Reads the points and faces of a mesh through the API, which is much faster than polyInfo on dense meshes
+
+    Returns:
+        points (np.ndarray): Vx3 vertex positions
+        face_offsets (np.ndarray): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (np.ndarray): flat vertex ids of every face
+    """
+    mesh = get_mesh_fn(obj_name)
+    space = om.MSpace.kObject if object_space else om.MSpace.kWorld
+    points = np.array([(p.x, p.y, p.z) for p in mesh.getPoints(space)], dtype=np.float64).reshape(-1, 3)
+    counts, face_vertices = mesh.getVertices()
+    face_offsets = np.concatenate([[0], np.cumsum(np.array(counts, dtype=np.int64))])
+    return points, face_offsets, np.array(face_vertices, dtype=np.int64)
+
+
+def set_points(obj_name, points, object_space=False):
+    """Writes every vertex position of a mesh in a single call
+
+    This goes through the API, so unlike moving components with cmds it doesn't add to the undo queue
+    """
+    mesh = get_mesh_fn(obj_name)
+    space = om.MSpace.kObject if object_space else om.MSpace.kWorld
+    mesh.setPoints(om.MPointArray([om.MPoint(*pos) for pos in np.asarray(points, dtype=np.float64).tolist()]), space)
+
+
+def get_face_vertex_normals(obj_name, object_space=False):
+    """Returns the normal of every face vertex, in the same order as MeshSnapshot.face_vertices
+
+    These are the normals polyNormalPerVertex reports, so hard edges and locked normals are respected
+    """
+    mesh = get_mesh_fn(obj_name)
+    space = om.MSpace.kObject if object_space else om.MSpace.kWorld
+    normals = np.array([(n.x, n.y, n.z) for n in mesh.getNormals(space)], dtype=np.float64).reshape(-1, 3)
+    _, normal_ids = mesh.getNormalIds()
+    return normals[np.array(normal_ids, dtype=np.int64)]
+
+
+def get_mesh_uvs(obj_name):
+    """Returns the UVs of an object and how they are assigned to it's faces
+
+    Returns:
+        uvs (np.ndarray): Nx2 UV coordinates
+        uv_counts (np.ndarray): number of UVs assigned to each face, 0 for faces without UVs
+        uv_ids (np.ndarray): flat UV ids of every face vertex that has one
+    """
+    mesh = get_mesh_fn(obj_name)
+    us, vs = mesh.getUVs()
+    uvs = np.column_stack([np.array(us, dtype=np.float64), np.array(vs, dtype=np.float64)])
+    uv_counts, uv_ids = [np.array(i, dtype=np.int64) for i in mesh.getAssignedUVs()]
+    return uvs, uv_counts, uv_ids
+
+
+def get_corner_uvs(obj_name, face_offsets):
+    """Returns the UVs of an object and the UV id of every face corner, -1 on faces without UVs"""
+    uvs, uv_counts, uv_ids = get_mesh_uvs(obj_name)
+    counts = np.diff(face_offsets)
+    corner_uvs = np.full(face_offsets[-1], -1, dtype=np.int64)
+    corner_uvs[np.repeat(uv_counts == counts, counts)] = uv_ids
+    return uvs, corner_uvs
+
+
+def get_face_shading_groups(obj_name, num_faces):
+    """Returns the shading group every face of an object is assigned to, None for faces without one
+
+    Handles objects assigned as a whole as well as per face assignments
+    """
+    face_groups = np.full(num_faces, None, dtype=object)
+    shapes = cmds.listRelatives(obj_name, shapes=True) or []
+    for shading_group in sorted(set(cmds.listConnections(shapes, type="shadingEngine") or [])):
+        for member in cmds.sets(shading_group, q=True) or []:
+            if "." not in member:
+                if member.split("|")[-1] in [obj_name] + shapes:
+                    face_groups[:] = shading_group
+                continue
+            selection = ComponentSelection.from_name(member)
+            if selection.kind == "f" and selection.obj_name.split("|")[-1] in [obj_name] + shapes:
+                face_groups[selection.ids] = shading_group
+    return face_groups
+
+
+def get_assigned_uvs(face_offsets, corner_uvs):
+    """Turns the UV id of every face corner back into the per face counts and flat ids create_mesh takes
+
+    Faces without a UV on every corner are left without UVs
+    """
+    counts = np.diff(face_offsets)
+    has_uvs = np.minimum.reduceat(corner_uvs, face_offsets[:-1]) >= 0
+    return counts * has_uvs, corner_uvs[np.repeat(has_uvs, counts)]
+
+
+def assign_face_shading_groups(obj_name, face_groups):
+    """Assigns every face of an object to the shading group get_face_shading_groups gave it, faces with None are skipped
+
+    Runs of faces with the same shading group are assigned in one call
+    """
+    starts = np.flatnonzero(np.concatenate([[True], face_groups[1:] != face_groups[:-1]]))
+    ends = np.concatenate([starts[1:], [len(face_groups)]]) - 1
+    for start, end in zip(starts, ends):
+        if face_groups[start] is not None:
+            cmds.sets("{}.f[{}:{}]".format(obj_name, start, end), e=True, forceElement=face_groups[start])
+
+
+def create_mesh(name, points, face_offsets, face_vertices, uvs=None, uv_counts=None, uv_ids=None):
+    """Creates a new mesh from arrays in a single call
+
+    Args:
+        name (str): name to give the new object
+        points (float[][]): Vx3 vertex positions
+        face_offsets (int[]): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (int[]): flat vertex ids of every face
+        uvs (float[][]): optional Nx2 UV coordinates
+        uv_counts (int[]): number of UVs assigned to each face, needed with uvs
+        uv_ids (int[]): flat UV ids of every face vertex, needed with uvs
+
+    Returns:
+        str: name of the new object
+    """
+    points = om.MPointArray([om.MPoint(*pos) for pos in np.asarray(points, dtype=np.float64).tolist()])
+    counts = om.MIntArray(np.diff(face_offsets).tolist())
+    connects = om.MIntArray(np.asarray(face_vertices, dtype=np.int64).tolist())
+    mesh = om.MFnMesh()
+    if uvs is None:
+        transform = mesh.create(points, counts, connects)
+    else:
+        uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+        transform = mesh.create(points, counts, connects, om.MFloatArray(uvs[:, 0].tolist()), om.MFloatArray(uvs[:, 1].tolist()))
+        mesh.assignUVs(om.MIntArray(np.asarray(uv_counts).tolist()), om.MIntArray(np.asarray(uv_ids).tolist()))
+    return cmds.rename(om.MFnDagNode(transform).partialPathName(), name)
+
+
 def unpack_selection_items(selection_items):
     """Unpacks slice notation into seperate items
     
     ["pPlane1.vtx[50:52]"] -> ["pPlane1.vtx[50]", "pPlane1.vtx[51]", "pPlane1.vtx[52]"]
+
+    This builds a string for every component, ComponentSelection keeps large selections as ranges instead
     """
-    unformatted = []
+    formatted = []
     for selection_item in selection_items:
         if ":" not in selection_item:
-            unformatted.append(selection_item)
-            continue
-        name, type_ = selection_item.split(".")
-        type_ = filter(lambda x: x in string.ascii_letters, type_)
-        nums = selection_item.split('[', 1)[1].split(']')[0]
-        num1, num2, = [int(i) for i in nums.split(":")]
-        unformatted.append(["{}.{}[{}]".format(name, type_, i) for i in range(num1, num2 + 1)])
-    formatted = []
-    for i in unformatted:
-        if type(i) != list:
-            formatted.append(i)
+            formatted.append(selection_item)
         else:
-            for j in i:
-                formatted.append(j)
+            formatted += list(ComponentSelection.from_name(selection_item))
     return formatted
 
 def cube_at_point(pos):
@@ -95,3 +838,318 @@ def distance_between(pos1, pos2):
     power = [i ** 2 for i in difference]
     squared_dist = sum(power)
     return math.sqrt(squared_dist)
+
+
+def euler_to_matrices(angles):
+    """Converts Nx3 euler [x, y, z] degrees to Nx3x3 rotation matrices, in maya's default xyz rotate order"""
+    x, y, z = np.radians(np.asarray(angles, dtype=np.float64).reshape(-1, 3)).T
+    cx, cy, cz, sx, sy, sz = np.cos(x), np.cos(y), np.cos(z), np.sin(x), np.sin(y), np.sin(z)
+    return np.stack([
+        np.stack([cy*cz, sx*sy*cz - cx*sz, cx*sy*cz + sx*sz], axis=1),
+        np.stack([cy*sz, sx*sy*sz + cx*cz, cx*sy*sz - sx*cz], axis=1),
+        np.stack([-sy, sx*cy, cx*cy], axis=1),
+    ], axis=1)
+
+
+def normalize(vectors):
+    """Normalizes Nx3 vectors, zero length vectors are left as they are"""
+    vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 3)
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(lengths == 0, 1, lengths)
+
+
+def get_next_corners(face_offsets):
+    """Returns the corner that follows every face corner around it's face, the last corner wraps back to the first"""
+    face_offsets = np.asarray(face_offsets, dtype=np.int64)
+    next_corners = np.arange(1, face_offsets[-1] + 1)
+    next_corners[face_offsets[1:] - 1] = face_offsets[:-1]
+    return next_corners
+
+
+def get_prev_corners(face_offsets):
+    """Returns the corner before every face corner around it's face, the first corner wraps back to the last"""
+    face_offsets = np.asarray(face_offsets, dtype=np.int64)
+    prev_corners = np.arange(-1, face_offsets[-1] - 1)
+    prev_corners[face_offsets[:-1]] = face_offsets[1:] - 1
+    return prev_corners
+
+
+def get_face_centroids(points, face_offsets, face_vertices):
+    """Returns the Fx3 average of each face's vertex positions"""
+    sums = np.add.reduceat(points[face_vertices], face_offsets[:-1], axis=0)
+    return sums / np.diff(face_offsets)[:, None]
+
+
+def get_face_vector_areas(points, face_offsets, face_vertices):
+    """Returns an Fx3 vector for every face that points along it's normal and is as long as it's area"""
+    # Summing the cross products of a fan around each face's first vertex gives twice it's vector area
+    counts = np.diff(face_offsets)
+    corners = points[face_vertices]
+    first = np.repeat(corners[face_offsets[:-1]], counts, axis=0)
+    cross = np.cross(corners - first, corners[get_next_corners(face_offsets)] - first)
+    return np.add.reduceat(cross, face_offsets[:-1], axis=0) / 2
+
+
+def randomize_face_points(points, face_offsets, face_vertices, rng, move_thresh=0.1, rotate_thresh=1, move_bias=None,
+                          rotate_bias=None, component_space=False):
+    """Randomly rotates and moves every face around it's centroid, returns the new points
+
+    A vertex shared by several faces gets the sum of what each of them would do to it on it's own, so the result
+    doesn't depend on face order. Values are drawn for every face, so a seeded rng always gives the same values
+    per face, and faces pointing straight up or down are left alone.
+
+    Args:
+        points (float[][]): Vx3 vertex positions
+        face_offsets (int[]): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (int[]): flat vertex ids of every face
+        rng (np.random.Generator): random generator to draw from
+        move_thresh (float): maximum distance to move each face along each axis
+        rotate_thresh (float): maximum degrees to rotate each face around each axis
+        move_bias (float[]): per axis multipliers for the move
+        rotate_bias (float[]): per axis multipliers for the rotation
+        component_space (bool): move and rotate each face along it's own normal instead of the world axes
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    num_faces = len(face_offsets) - 1
+    normals = normalize(get_face_vector_areas(points, face_offsets, face_vertices))
+
+    rotate_coords = rng.uniform(-rotate_thresh, rotate_thresh, (num_faces, 3)) * (rotate_bias or 1)
+    move_coords = rng.uniform(-move_thresh, move_thresh, (num_faces, 3)) * (move_bias or 1)
+    # Rounded like polyInfo prints normals
+    straight = np.abs(np.round(normals[:, 1], 6)) == 1
+    rotate_coords[straight] = 0
+    move_coords[straight] = 0
+
+    rotations = euler_to_matrices(rotate_coords)
+    if component_space:
+        # Each face's frame has it's normal as Z and it's first edge as X
+        first_edges = points[face_vertices[face_offsets[:-1] + 1]] - points[face_vertices[face_offsets[:-1]]]
+        x_axes = normalize(first_edges - normals * np.einsum("ij,ij->i", first_edges, normals)[:, None])
+        frames = np.stack([x_axes, np.cross(normals, x_axes), normals], axis=2)
+        rotations = np.einsum("nij,njk,nlk->nil", frames, rotations, frames)
+        move_coords = np.einsum("nij,nj->ni", frames, move_coords)
+
+    # Transforming every face corner around it's face centroid and adding up the offsets per vertex
+    corner_faces = np.repeat(np.arange(num_faces), np.diff(face_offsets))
+    local = points[face_vertices] - get_face_centroids(points, face_offsets, face_vertices)[corner_faces]
+    offsets = np.einsum("nij,nj->ni", rotations[corner_faces], local) - local + move_coords[corner_faces]
+    points = points.copy()
+    np.add.at(points, face_vertices, offsets)
+    return points
+
+
+# Large primes for hashing integer grid cells, collisions only cost extra distance checks
+HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+
+
+def match_points(points, targets, tolerance=0.001):
+    """Finds every pair of points and targets that are within tolerance of each other
+
+    Uses a spatial hash with a cell size of tolerance, so only the 27 cells around each target are searched
+
+    Args:
+        points (float[][]): Nx3 positions to search from
+        targets (float[][]): Mx3 positions to search for
+        tolerance (float): maximum distance between matching positions
+
+    Returns:
+        point_ids (np.ndarray): indices into points for each match
+        target_ids (np.ndarray): indices into targets for each match
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    empty = np.zeros(0, dtype=np.int64)
+    if not len(points) or not len(targets):
+        return empty, empty
+
+    # Sorting the points by their hashed cell so each cell is a contiguous range,
+    # the 27 neighbouring cells are then looked up for every target
+    point_cells = np.floor(points / tolerance).astype(np.int64)
+    point_keys = np.bitwise_xor.reduce(point_cells * HASH_PRIMES, axis=1)
+    order = np.argsort(point_keys, kind="stable")
+    sorted_keys = point_keys[order]
+
+    target_cells = np.floor(targets / tolerance).astype(np.int64)
+    point_ids, target_ids = [], []
+    for offset in np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1])).T.reshape(-1, 3):
+        keys = np.bitwise_xor.reduce((target_cells + offset) * HASH_PRIMES, axis=1)
+        lo = np.searchsorted(sorted_keys, keys, side="left")
+        hi = np.searchsorted(sorted_keys, keys, side="right")
+        counts = hi - lo
+        if not counts.any():
+            continue
+        # Expanding every [lo, hi) range into candidate pairs
+        candidate_targets = np.repeat(np.arange(len(targets)), counts)
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        candidate_points = order[starts + np.arange(counts.sum())]
+        dist = np.sum((points[candidate_points] - targets[candidate_targets]) ** 2, axis=1)
+        close = dist <= tolerance ** 2
+        point_ids.append(candidate_points[close])
+        target_ids.append(candidate_targets[close])
+
+    if not point_ids:
+        return empty, empty
+    # Hash collisions between neighbouring cells can report the same pair twice
+    pairs = np.unique(np.stack([np.concatenate(point_ids), np.concatenate(target_ids)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def weld_points(points, face_offsets, face_vertices, tolerance=0.001):
+    """Merges vertices that are within tolerance of each other by remapping the faces, like polyMergeVertex
+
+    Merged vertices move to the average of their positions. Face corners that land on the same vertex as the
+    next corner are dropped, then faces left with less than three corners and vertices no face uses.
+
+    Args:
+        points (float[][]): Vx3 vertex positions
+        face_offsets (int[]): F+1 offsets into face_vertices, like MeshSnapshot stores them
+        face_vertices (int[]): flat vertex ids of every face
+        tolerance (float): vertices closer than this are merged
+
+    Returns:
+        points (np.ndarray): welded vertex positions
+        face_offsets (np.ndarray): offsets into the welded face_vertices
+        face_vertices (np.ndarray): flat vertex ids of every welded face
+        corners (np.ndarray): index into the original face_vertices of every welded face corner, to carry per corner data over
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    face_offsets = np.asarray(face_offsets, dtype=np.int64)
+    face_vertices = np.asarray(face_vertices, dtype=np.int64)
+
+    # Every vertex takes the lowest id it's connected to, jumping through the labels keeps chains short
+    a, b = match_points(points, points, tolerance)
+    labels = np.arange(len(points))
+    while len(a):
+        lowest = np.minimum(labels[a], labels[b])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, a, lowest)
+        np.minimum.at(new_labels, b, lowest)
+        new_labels = new_labels[new_labels]
+        if (new_labels == labels).all():
+            break
+        labels = new_labels
+    _, groups = np.unique(labels, return_inverse=True)
+    groups = groups.reshape(-1)
+    sizes = np.bincount(groups)
+    merged = np.zeros((len(sizes), 3))
+    np.add.at(merged, groups, points)
+    merged /= sizes[:, None]
+
+    remapped = groups[face_vertices]
+    counts = np.diff(face_offsets)
+    corner_faces = np.repeat(np.arange(len(counts)), counts)
+    keep = remapped != remapped[get_next_corners(face_offsets)]
+    keep &= (np.bincount(corner_faces[keep], minlength=len(counts)) >= 3)[corner_faces]
+
+    corners = np.flatnonzero(keep)
+    counts = np.bincount(corner_faces[corners], minlength=len(counts))
+    face_offsets = np.concatenate([[0], np.cumsum(counts[counts > 0])])
+    used, face_vertices = np.unique(remapped[corners], return_inverse=True)
+    return merged[used], face_offsets, face_vertices.reshape(-1), corners
+
+
+class UVIndex(object):
+    """Nearest neighbor index over the UVs of a mesh
+
+    UVs are hashed into a uniform grid, a query looks at the 3x3 cells around it and moves
+    to a coarser grid until the nearest UV found is closer than the cell size.
+
+    Args:
+        uvs (float[][]): Nx2 UV coordinates
+        uv_vertices (int[]): vertex id of every UV
+    """
+
+    def __init__(self, uvs, uv_vertices):
+        self.uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+        self.uv_vertices = np.asarray(uv_vertices, dtype=np.int64)
+        span = self.uvs.max(axis=0) - self.uvs.min(axis=0) if len(self.uvs) else np.ones(2)
+        # Aiming for about one UV per cell on the finest grid
+        self.cell_size = max(span.max(), 1e-6) / max(1.0, math.sqrt(len(self.uvs)))
+        self._grids = {}
+
+    def __len__(self):
+        return len(self.uvs)
+
+    def _grid(self, level):
+        if level not in self._grids:
+            size = self.cell_size * 2 ** level
+            cells = np.floor(self.uvs / size).astype(np.int64)
+            keys = np.bitwise_xor.reduce(cells * HASH_PRIMES[:2], axis=1)
+            order = np.argsort(keys, kind="stable")
+            self._grids[level] = (size, order, keys[order])
+        return self._grids[level]
+
+    def nearest(self, coords):
+        """Returns the id of the nearest UV to each of the Mx2 coords"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        nearest = np.full(len(coords), -1, dtype=np.int64)
+        best = np.full(len(coords), np.inf)
+        if not len(self.uvs):
+            raise Exception("Can't search an empty UV index")
+        span = np.ptp(self.uvs, axis=0).max()
+
+        pending = np.arange(len(coords))
+        level = 0
+        while len(pending):
+            size, order, sorted_keys = self._grid(level)
+            if size > span:
+                # Cells are bigger than the whole UV set by now, so the rest are far away and compared against every UV
+                for chunk in np.array_split(pending, max(1, len(pending) * len(self.uvs) // 10 ** 7)):
+                    dist = np.sum((coords[chunk, None] - self.uvs[None]) ** 2, axis=2)
+                    nearest[chunk] = dist.argmin(axis=1)
+                break
+
+            cells = np.floor(coords[pending] / size).astype(np.int64)
+            for offset in np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1])).T.reshape(-1, 2):
+                keys = np.bitwise_xor.reduce((cells + offset) * HASH_PRIMES[:2], axis=1)
+                lo = np.searchsorted(sorted_keys, keys, side="left")
+                hi = np.searchsorted(sorted_keys, keys, side="right")
+                counts = hi - lo
+                if not counts.any():
+                    continue
+                queries = np.repeat(pending, counts)
+                starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+                candidates = order[starts + np.arange(counts.sum())]
+                dist = np.sum((coords[queries] - self.uvs[candidates]) ** 2, axis=1)
+                # Keeping the closest candidate per query, lowest UV id on ties
+                first = np.lexsort((candidates, dist, queries))
+                queries, candidates, dist = queries[first], candidates[first], dist[first]
+                _, firsts = np.unique(queries, return_index=True)
+                queries, candidates, dist = queries[firsts], candidates[firsts], dist[firsts]
+                closer = (dist < best[queries]) | ((dist == best[queries]) & (candidates < nearest[queries]))
+                best[queries[closer]] = dist[closer]
+                nearest[queries[closer]] = candidates[closer]
+
+            # Anything closer than the cell size is guaranteed to be in the 3x3 cells that were searched
+            pending = pending[best[pending] > size ** 2]
+            level += 1
+        return nearest
+
+
+# Object name -> (signature, UVIndex)
+UV_INDEX_CACHE = {}
+
+
+def get_uv_index(obj_name):
+    """Returns a UVIndex of an object, only rebuilt when the object's topology or UVs change"""
+    mesh = get_mesh_fn(obj_name)
+    us, vs = mesh.getUVs()
+    uvs = np.column_stack([np.array(us, dtype=np.float64), np.array(vs, dtype=np.float64)])
+    signature = (mesh.numVertices, mesh.numPolygons, hashlib.sha1(uvs.tobytes()).hexdigest())
+
+    cached = UV_INDEX_CACHE.get(obj_name)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    # Face vertices and their assigned UVs come in the same order, faces without UVs are skipped in the UV list
+    uv_counts, uv_ids = [np.array(i, dtype=np.int64) for i in mesh.getAssignedUVs()]
+    vert_counts, vert_ids = [np.array(i, dtype=np.int64) for i in mesh.getVertices()]
+    has_uvs = np.repeat(uv_counts == vert_counts, vert_counts)
+    uv_vertices = np.full(len(uvs), -1, dtype=np.int64)
+    uv_vertices[uv_ids] = vert_ids[has_uvs]
+
+    # Leaving out UVs that aren't assigned to any face
+    assigned = uv_vertices >= 0
+    index = UVIndex(uvs[assigned], uv_vertices[assigned])
+    UV_INDEX_CACHE[obj_name] = (signature, index)
+    return index
@@ -1,8 +1,152 @@
 import maya.cmds as cmds  
+import numpy as np
 
-def wireframe(obj_name, offset, thickness):
+def wireframe(obj_name, offset, thickness, bulk=False):
+    if bulk:
+        return wireframe_bulk(obj_name, offset, thickness)
     cmds.select(obj_name + ".f[0:]")
     cmds.setAttr(cmds.polyExtrudeFacet(keepFacesTogether=False)[0] + ".offset", offset)
     cmds.delete()
     cmds.select("{}.f[0:]".format(obj_name))
-    cmds.polyExtrudeFacet(thickness=thickness)
\ No newline at end of file
+    cmds.polyExtrudeFacet(thickness=thickness)
+
+def wireframe_bulk(obj_name, offset, thickness, chunk_size=100000):
+    """Builds the same wireframe from arrays and creates it as one new mesh in place of obj_name
+
+    Args:
+        obj_name (str): mesh to turn into a wireframe
+        offset (float): how far every face is inset, the width of the wires
+        thickness (float): how far the wires are extruded along the vertex normals
+        chunk_size (int): number of faces processed at a time, see build_wireframe
+
+    Returns:
+        str: name of the new mesh
+    """
+    points, face_offsets, face_vertices = get_mesh_arrays(obj_name, object_space=True)
+    uvs, corner_uvs = get_corner_uvs(obj_name, face_offsets)
+    face_groups = get_face_shading_groups(obj_name, len(face_offsets) - 1)
+    wire_points, wire_offsets, wire_vertices, wire_corners, wire_uvs, wire_corner_uvs = build_wireframe(
+        points, face_offsets, face_vertices, offset, thickness, chunk_size, uvs, corner_uvs)
+    uv_counts, uv_ids = get_assigned_uvs(wire_offsets, wire_corner_uvs)
+
+    # The original is only replaced once the wireframe exists, so a failed create leaves it untouched
+    name = obj_name.split("|")[-1]
+    new_obj = create_mesh(name + "Wireframe", wire_points, wire_offsets, wire_vertices, wire_uvs, uv_counts, uv_ids)
+    cmds.xform(new_obj, matrix=cmds.xform(obj_name, q=True, matrix=True, ws=True), ws=True)
+    # Every wireframe face keeps the shading group of the face it was built from
+    corner_faces = np.repeat(np.arange(len(face_offsets) - 1), np.diff(face_offsets))
+    assign_face_shading_groups(new_obj, face_groups[corner_faces[wire_corners]])
+    cmds.delete(obj_name)
+    return cmds.rename(new_obj, name)
+
+def build_wireframe(points, face_offsets, face_vertices, offset, thickness, chunk_size=100000, uvs=None, corner_uvs=None):
+    """Builds the mesh wireframe makes with two extrudes straight from vertex and face arrays
+
+    Every face is inset by offset into a ring of quads, one per corner, then the rings are moved out along the
+    vertex normals by thickness with walls around the holes and the borders of the mesh. Faces come out in the same
+    order as the extrudes leave them: every ring quad face by face, the hole walls, then the border walls.
+
+    UVs are inset along with the faces, and the walls reuse the UVs of the edges they are extruded from.
+
+    Faces are worked through chunk_size at a time so the temporary arrays stay bounded, only the result and the
+    search for border edges cover the whole mesh at once.
+
+    Args:
+        uvs (float[][]): optional Nx2 UV coordinates
+        corner_uvs (int[]): UV id of every face corner, -1 on faces without UVs, like get_corner_uvs returns
+
+    Returns:
+        points (np.ndarray): Vx3 vertex positions of the wireframe
+        face_offsets (np.ndarray): F+1 offsets into face_vertices
+        face_vertices (np.ndarray): flat vertex ids of every face
+        face_corners (np.ndarray): corner of the original faces every wireframe face was built from
+        uvs (np.ndarray): UV coordinates of the wireframe, the original ones followed by one inset UV per corner
+        corner_uvs (np.ndarray): UV id of every wireframe face corner, -1 where the original face had none
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    face_offsets = np.asarray(face_offsets, dtype=np.int64)
+    face_vertices = np.asarray(face_vertices, dtype=np.int64)
+    num_verts, num_corners, num_faces = len(points), len(face_vertices), len(face_offsets) - 1
+    uvs = np.zeros((0, 2)) if uvs is None else np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+    corner_uvs = np.full(num_corners, -1, dtype=np.int64) if corner_uvs is None else np.asarray(corner_uvs, dtype=np.int64)
+    inset_uvs = np.zeros((num_corners, 2))
+
+    next_corners = get_next_corners(face_offsets)
+    prev_corners = get_prev_corners(face_offsets)
+
+    # Edges only one face uses are on the border of the mesh and get a wall of their own
+    ends = face_vertices[next_corners]
+    keys = np.minimum(face_vertices, ends) * num_verts + np.maximum(face_vertices, ends)
+    _, inverse, edge_counts = np.unique(keys, return_inverse=True, return_counts=True)
+    border = np.flatnonzero(edge_counts[inverse.reshape(-1)] == 1)
+    del ends, keys, inverse
+    border_starts, border_ends = face_vertices[border], face_vertices[next_corners[border]]
+    border_verts = np.unique(np.concatenate([border_starts, border_ends]))
+    bottom_ids = np.full(num_verts, -1, dtype=np.int64)
+    bottom_ids[border_verts] = num_verts + 2 * num_corners + np.arange(len(border_verts))
+
+    # Original verts moved out by thickness come first, then the moved and unmoved inset ring verts of every corner
+    wire_points = np.empty((num_verts + 2 * num_corners + len(border_verts), 3))
+    wire_face_vertices = np.empty(4 * (2 * num_corners + len(border)), dtype=np.int64)
+    normals = np.zeros((num_verts, 3))
+    normal_counts = np.bincount(face_vertices, minlength=num_verts)
+    for start in range(0, num_faces, chunk_size):
+        stop = min(num_faces, start + chunk_size)
+        first, last = face_offsets[start], face_offsets[stop]
+        verts = face_vertices[first:last]
+        face_normals = normalize(get_face_vector_areas(points, face_offsets[start:stop + 1] - first, verts))
+        corner_normals = np.repeat(face_normals, np.diff(face_offsets[start:stop + 1]), axis=0)
+        for axis in range(3):
+            normals[:, axis] += np.bincount(verts, corner_normals[:, axis], minlength=num_verts)
+
+        # Every corner moves in along it's face so both of it's edges end up offset away from the originals
+        corners = points[verts]
+        inward_prev = normalize(np.cross(corner_normals, corners - points[face_vertices[prev_corners[first:last]]]))
+        inward_next = normalize(np.cross(corner_normals, points[face_vertices[next_corners[first:last]]] - corners))
+        miter = 1 + np.einsum("ij,ij->i", inward_prev, inward_next)
+        insets = corners + offset * (inward_prev + inward_next) / np.maximum(miter, 1e-6)[:, None]
+
+        # The inset UV sits in the same spot relative to the corner's two edges as the inset point does
+        has_uvs = corner_uvs[first:last] >= 0
+        if has_uvs.any():
+            prev_edges = points[face_vertices[prev_corners[first:last]]] - corners
+            next_edges = points[face_vertices[next_corners[first:last]]] - corners
+            moves = insets - corners
+            pp, pn, nn = [np.einsum("ij,ij->i", a, b) for a, b in ((prev_edges, prev_edges), (prev_edges, next_edges), (next_edges, next_edges))]
+            mp, mn = np.einsum("ij,ij->i", moves, prev_edges), np.einsum("ij,ij->i", moves, next_edges)
+            det = pp * nn - pn ** 2
+            det = np.where(det == 0, np.inf, det)
+            along_prev, along_next = (mp * nn - mn * pn) / det, (mn * pp - mp * pn) / det
+            corner_uv = uvs[corner_uvs[first:last]]
+            prev_uv = uvs[corner_uvs[prev_corners[first:last]]]
+            next_uv = uvs[corner_uvs[next_corners[first:last]]]
+            inset_uv = corner_uv + along_prev[:, None] * (prev_uv - corner_uv) + along_next[:, None] * (next_uv - corner_uv)
+            inset_uvs[first:last][has_uvs] = inset_uv[has_uvs]
+        wire_points[num_verts + first:num_verts + last] = insets + thickness * corner_normals
+        wire_points[num_verts + num_corners + first:num_verts + num_corners + last] = insets
+
+        tops = num_verts + np.arange(first, last)
+        next_tops = num_verts + next_corners[first:last]
+        wire_face_vertices[4 * first:4 * last] = np.stack([verts, face_vertices[next_corners[first:last]], next_tops, tops], axis=1).ravel()
+        holes = np.stack([next_tops + num_corners, tops + num_corners, tops, next_tops], axis=1)
+        wire_face_vertices[4 * (num_corners + first):4 * (num_corners + last)] = holes.ravel()
+
+    # Scaled so the faces around each vert end up thickness away on average, like the consistent thickness of the extrude
+    lengths = np.einsum("ij,ij->i", normals, normals)
+    wire_points[:num_verts] = points + thickness * normals * (normal_counts / np.where(lengths == 0, 1, lengths))[:, None]
+    wire_points[num_verts + 2 * num_corners:] = points[border_verts]
+    walls = np.stack([bottom_ids[border_starts], bottom_ids[border_ends], border_ends, border_starts], axis=1)
+    wire_face_vertices[8 * num_corners:] = walls.ravel()
+
+    # UVs follow the same layout as the vertices of every face
+    ids = np.arange(num_corners)
+    inset_ids = np.where(corner_uvs >= 0, len(uvs) + ids, -1)
+    next_uvs, next_inset_ids = corner_uvs[next_corners], inset_ids[next_corners]
+    wire_corner_uvs = np.concatenate([
+        np.stack([corner_uvs, next_uvs, next_inset_ids, inset_ids], axis=1).ravel(),
+        np.stack([next_inset_ids, inset_ids, inset_ids, next_inset_ids], axis=1).ravel(),
+        np.stack([corner_uvs[border], next_uvs[border], next_uvs[border], corner_uvs[border]], axis=1).ravel(),
+    ])
+    face_corners = np.concatenate([ids, ids, border])
+    return (wire_points, np.arange(0, len(wire_face_vertices) + 1, 4), wire_face_vertices, face_corners,
+            np.concatenate([uvs, inset_uvs]), wire_corner_uvs)